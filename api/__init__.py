@@ -1,7 +1,9 @@
 from fastapi import APIRouter
 
-from api import v1
+from api import v1, metrics, health
 
 router = APIRouter()
 
 router.include_router(v1.router, prefix="/v1")
+router.include_router(metrics.router)
+router.include_router(health.router)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from core.metrics.startup import startup
+
+router = APIRouter()
+
+
+@router.get("/ready", include_in_schema=False)
+async def get_readiness() -> JSONResponse:
+    """Готовность к трафику: 200 после прогрева, 503 до него и во время остановки"""
+    return JSONResponse(startup.snapshot(), status_code=200 if startup.ready else 503)
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.metrics.prometheus import registry
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """Метрики процесса в текстовом формате Prometheus"""
+    return PlainTextResponse(await registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
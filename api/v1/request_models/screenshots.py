@@ -1,8 +1,12 @@
 import datetime
 import random
+from typing import Literal
 
 from pydantic import BaseModel, field_validator, Field
 
+from config import BATCH_MAX_SIZE, RESULT_SIZES
+from core.imaging.encoder import SUPPORTED_FORMATS
+
 
 class PhantomScreenshot(BaseModel):
     domain: str = Field(..., min_length=1, max_length=100)
@@ -16,6 +20,11 @@ class PhantomScreenshot(BaseModel):
     token_amount: float
     usd_price_per_token: float
     token_logo: str | None = None
+    output_format: Literal["jpeg", "webp", "avif"] | None = None
+    # Зерно для случайных полей контекста: одинаковые запросы с одним seed дают один рендер
+    seed: int | None = None
+    # Уменьшенные копии (RESULT_SIZES), которые сохраняются вместе с результатом
+    sizes: list[str] = Field(default_factory=list)
 
     @field_validator("token_logo")
     @classmethod
@@ -24,6 +33,21 @@ class PhantomScreenshot(BaseModel):
             raise ValueError("token_logo должен быть data URI (data:image/...)")
         return v
 
+    @field_validator("output_format")
+    @classmethod
+    def validate_output_format(cls, v: str | None) -> str | None:
+        if v and v not in SUPPORTED_FORMATS:
+            raise ValueError(f"output_format {v} не поддерживается, доступны: {', '.join(SUPPORTED_FORMATS)}")
+        return v
+
+    @field_validator("sizes")
+    @classmethod
+    def validate_sizes(cls, v: list[str]) -> list[str]:
+        unknown = [size for size in v if size not in RESULT_SIZES]
+        if unknown:
+            raise ValueError(f"sizes {', '.join(unknown)} не поддерживаются, доступны: {', '.join(RESULT_SIZES)}")
+        return list(dict.fromkeys(v))
+
     @field_validator("multiplier")
     @classmethod
     def validate_multiplier(cls, v: str) -> str:
@@ -34,3 +58,6 @@ class PhantomScreenshot(BaseModel):
             raise ValueError("multiplier должен быть положительным числом")
         return v
 
+
+class PhantomScreenshotBatch(BaseModel):
+    items: list[PhantomScreenshot] = Field(..., min_length=1, max_length=BATCH_MAX_SIZE)
@@ -3,4 +3,24 @@ from pydantic import BaseModel
 
 class ScreenshotTaskResponse(BaseModel):
     status: str
-    task_id: str
\ No newline at end of file
+    task_id: str
+
+
+class ScreenshotBatchResponse(BaseModel):
+    status: str
+    batch_id: str
+    task_ids: list[str]
+
+
+class ScreenshotBatchTask(BaseModel):
+    task_id: str
+    state: str | None
+
+
+class ScreenshotBatchStatus(BaseModel):
+    batch_id: str
+    total: int
+    done: int
+    failed: int
+    pending: int
+    tasks: list[ScreenshotBatchTask]
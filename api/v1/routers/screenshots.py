@@ -1,18 +1,32 @@
-import asyncio
-import datetime
-import random
-import uuid
+import json
+import time
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import Response
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from starlette.responses import HTMLResponse
 
-from api.v1.request_models.screenshots import PhantomScreenshot
-from api.v1.response_models.screenshots import ScreenshotTaskResponse
+from api.v1.request_models.screenshots import PhantomScreenshot, PhantomScreenshotBatch
+from api.v1.response_models.screenshots import (
+    ScreenshotTaskResponse,
+    ScreenshotBatchResponse,
+    ScreenshotBatchStatus,
+    ScreenshotBatchTask,
+)
+from api.v1.services.batches import create_batch, get_batch_tasks, get_batch_states, stream_batch_archive
 from api.v1.services.crypto_rates import get_crypto_price
-from api.v1.services.screenshot_generator import screenshot_service
+from api.v1.services.logos import LogoError
+from api.v1.services.phantom import TEMPLATE_NAME, build_phantom_context, phantom_task_id, store_logo
+from api.v1.services.render_farm import renderer
+from api.v1.services.render_jobs import enqueue_render, render_consumer, render_queue
+from api.v1.services.result_notifier import result_notifier
+from api.v1.services.results import FULL_SIZE, RESULT_TTL, StoredResult, result_key, result_store
+from config import OUTPUT_FORMAT, RESULT_SIZES
 from core.caching.in_redis import cache
+from core.http.conditional import IMMUTABLE_CACHE_CONTROL, NO_STORE_CACHE_CONTROL, etag_matches
+from core.http.static_pages import StaticPage
+from core.imaging.encoder import MEDIA_TYPES, SUPPORTED_FORMATS, image_encoder, negotiate_format
+from core.queue.in_redis import QueueFullError, DONE, FAILED
 
 router = APIRouter(tags=["Screenshots"])
 
@@ -20,6 +34,16 @@ PROJECT_ROOT = (
     Path(__file__).resolve().parents[3]
 )
 
+# Максимальное ожидание long-poll запроса /result и период keepalive для SSE
+RESULT_MAX_WAIT = 30
+SSE_KEEPALIVE = 15
+# Через сколько секунд повторить /result, пока задача в очереди
+RESULT_RETRY_AFTER = 1
+
+INDEX_PAGE = StaticPage(PROJECT_ROOT / "statics" / "index.html")
+PHANTOM_PAGE = StaticPage(PROJECT_ROOT / "statics" / "phantom.html")
+STATIC_PAGES = (INDEX_PAGE, PHANTOM_PAGE)
+
 
 @router.post(
     "/phantom",
@@ -27,62 +51,271 @@ PROJECT_ROOT = (
     responses={200: {"content": {"image/jpeg": {}}}},
 )
 async def generate_phantom_screenshot(ctx: PhantomScreenshot) -> ScreenshotTaskResponse:
-    task_id = f"phantom_{uuid.uuid4()}"
-    context = ctx.model_dump()
+    try:
+        ctx = await store_logo(ctx)
+    except LogoError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     rate = await get_crypto_price(
         "SOL", "usd"
     )
-    context["solana_amount_usdt"] = round(random.uniform(500, 3000), 2)
-    context["solana_amount"] = f"{round(context["solana_amount_usdt"] / rate["price"], 2):.2f}"
-    context["solana_amount_change"] = round(random.uniform(0.01, 2) * random.choice([-1, 1]), 2)
-    context["usdt_amount_change"] = round(random.uniform(0.01, 0.05) * random.choice([-1, 1]), 2)
-    context["current_time"] = datetime.datetime.utcnow().strftime("%H:%M")
-    context["token_amount_usd"] = round(ctx.token_amount * ctx.usd_price_per_token, 2)
-    context["token_change"] = round(random.uniform(0.01, 1) * random.choice([-1, 1]), 2)
-    context["total_diff"] = context["solana_amount_change"] + context["usdt_amount_change"] + context["token_change"]
-    context["total"] = context["solana_amount_usdt"] + context["usdt_amount"] + context["token_amount_usd"]
-    context["total_diff_percent"] = f'{round(context["total_diff"] / context["total"] * 100, 2):.2f}'
-    context["token_change"] = f'{context["token_change"]:.2f}'
-    context["solana_amount_change"] = f'{context["solana_amount_change"]:.2f}'
-    context["usdt_amount_change"] = f'{context["usdt_amount_change"]:.2f}'
-    context["solana_amount_usdt"] = f"{round(random.uniform(500, 3000), 2):.2f}"
-    context["token_amount"] = f"{ctx.token_amount:.2f}"
-    context["usdt_amount"] = f"{ctx.usdt_amount:.2f}"
-    context["token_amount_usd"] = f"{context["token_amount_usd"]:.2f}"
-    context["total_diff"] = f'{context["total_diff"]:.2f}'
-    context["total"] = f'{context["total"]:.2f}'
+    context = build_phantom_context(ctx, rate["price"])
+    output_format = ctx.output_format or OUTPUT_FORMAT
+    task_id = phantom_task_id(context, output_format)
     try:
-        asyncio.create_task(screenshot_service.render_screenshot(
+        await enqueue_render(
             context,
-            template_name="phantom_wallet.html",
-            task_id=task_id
-        ))
+            template_name=TEMPLATE_NAME,
+            task_id=task_id,
+            output_format=output_format,
+            sizes=ctx.sizes,
+        )
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
     return ScreenshotTaskResponse(status="OK", task_id=task_id)
 
 
+@router.post(
+    "/phantom/batch",
+    response_model=ScreenshotBatchResponse,
+)
+async def generate_phantom_batch(batch: PhantomScreenshotBatch) -> ScreenshotBatchResponse:
+    try:
+        batch_id, task_ids = await create_batch(batch)
+    except LogoError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return ScreenshotBatchResponse(status="OK", batch_id=batch_id, task_ids=task_ids)
+
+
+@router.get(
+    "/phantom/batch/{batch_id}",
+    response_model=ScreenshotBatchStatus,
+)
+async def get_phantom_batch(batch_id: str) -> ScreenshotBatchStatus:
+    task_ids = await get_batch_tasks(batch_id)
+    if task_ids is None:
+        raise HTTPException(status_code=404, detail="Пачка не найдена")
+
+    states = await get_batch_states(task_ids)
+    done = sum(state == DONE for state in states.values())
+    failed = sum(state == FAILED for state in states.values())
+    return ScreenshotBatchStatus(
+        batch_id=batch_id,
+        total=len(task_ids),
+        done=done,
+        failed=failed,
+        pending=len(task_ids) - done - failed,
+        tasks=[ScreenshotBatchTask(task_id=task_id, state=states[task_id]) for task_id in task_ids],
+    )
+
+
+@router.get(
+    "/phantom/batch/{batch_id}/archive",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/zip": {}}}},
+)
+async def get_phantom_batch_archive(batch_id: str) -> StreamingResponse:
+    task_ids = await get_batch_tasks(batch_id)
+    if task_ids is None:
+        raise HTTPException(status_code=404, detail="Пачка не найдена")
+
+    return StreamingResponse(
+        stream_batch_archive(task_ids),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{batch_id}.zip"'},
+    )
+
+
 @router.get(
     "/phantom",
     response_class=HTMLResponse,
     responses={200: {"content": {"image/jpeg": {}}}},
 )
-async def get_generation_page() -> HTMLResponse:
-    HTML_PATH = PROJECT_ROOT / "statics" / "phantom.html"
-    html_content = HTML_PATH.read_text(encoding="utf-8")
-    return HTMLResponse(content=html_content, status_code=200)
+async def get_generation_page(request: Request) -> Response:
+    return PHANTOM_PAGE.response(request)
 
 
 @router.get(
     "/result",
     response_class=Response
 )
-async def get_result(task_id: str):
-    result = await cache.get(task_id, raw=True)
+async def get_result(
+    request: Request,
+    task_id: str,
+    wait: float = Query(0, ge=0, le=RESULT_MAX_WAIT, description="Long-poll: ждать результат до N секунд"),
+    output_format: str | None = Query(
+        None, alias="format", pattern="^(jpeg|webp|avif)$", description="Формат вместо согласования по Accept"
+    ),
+    size: str = Query(FULL_SIZE, description="Исходный размер (full) или уменьшенная копия из RESULT_SIZES"),
+):
+    if size != FULL_SIZE and size not in RESULT_SIZES:
+        raise HTTPException(status_code=422, detail=f"Доступные размеры: {', '.join([FULL_SIZE, *RESULT_SIZES])}")
+
+    # Копия, сохраненная при рендере, не требует чтения полного изображения
+    result = await result_store.get(result_key(task_id, size)) if size != FULL_SIZE else None
     if result is None:
+        result = await _wait_result(task_id, wait)
+        if result is not None and size != FULL_SIZE:
+            result = await _get_resized(task_id, result, size)
+        if result is None:
+            return await _missing_result(task_id)
+
+    fmt = output_format or negotiate_format(request.headers.get("accept"), available=result.format)
+    if fmt is None or fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=406, detail=f"Доступные форматы: {', '.join(SUPPORTED_FORMATS)}")
+    if fmt != result.format:
+        result = await _get_transcoded(task_id, size, result, fmt)
+        if result is None:
+            return await _missing_result(task_id)
+
+    # Файл назван хэшем содержимого — он же сильный ETag, без хэширования байтов на запрос
+    etag = f'"{result.digest[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL, "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    extension = "jpg" if fmt == "jpeg" else fmt
+    name = "phantom" if size == FULL_SIZE else f"phantom-{size}"
+    # Файл отдается сервером без чтения в память процесса (pathsend, если сервер его поддерживает)
+    return FileResponse(
+        result.path,
+        stat_result=result.stat,
+        media_type=MEDIA_TYPES[fmt],
+        headers=headers,
+        filename=f"{name}.{extension}",
+        content_disposition_type="inline",
+    )
+
+
+async def _wait_result(task_id: str, wait: float) -> StoredResult | None:
+    """Результат в исходном размере; при wait — ждать завершения рендера до wait секунд"""
+    result = await result_store.get(task_id)
+    if result is None and wait:
+        state = await render_queue.get_state(task_id)
+        if state is None or state.get("state") in (DONE, FAILED):
+            # Ждать нечего: задачи нет, она упала или результат уже удален — ответит _missing_result.
+            # Результат мог появиться между двумя чтениями, поэтому перечитываем его
+            return await result_store.get(task_id)
+        with result_notifier.subscribe(task_id) as finished:
+            # Повторная проверка после подписки закрывает гонку с уведомлением
+            result = await result_store.get(task_id)
+            if result is None:
+                status = await result_notifier.wait(finished, wait)
+                if status == FAILED:
+                    state = await render_queue.get_state(task_id) or {}
+                    raise HTTPException(status_code=500, detail=state.get("error", "Рендер не удался"))
+                if status == DONE:
+                    result = await result_store.get(task_id)
+    return result
+
+
+async def _missing_result(task_id: str) -> JSONResponse:
+    """Результата нет: 202, пока задача в работе, 404 — если задачи нет или она истекла"""
+    state = await render_queue.get_state(task_id)
+    if state is None or state.get("state") == DONE:
+        raise HTTPException(
+            status_code=404,
+            detail="Результат не найден",
+            headers={"Cache-Control": NO_STORE_CACHE_CONTROL},
+        )
+    if state.get("state") == FAILED:
+        raise HTTPException(
+            status_code=500,
+            detail=state.get("error", "Рендер не удался"),
+            headers={"Cache-Control": NO_STORE_CACHE_CONTROL},
+        )
+    return JSONResponse(
+        {"task_id": task_id, **state},
+        status_code=202,
+        headers={"Cache-Control": NO_STORE_CACHE_CONTROL, "Retry-After": str(RESULT_RETRY_AFTER)},
+    )
+
+
+async def _get_resized(task_id: str, source: StoredResult, size: str) -> StoredResult | None:
+    """Уменьшенная копия, не заказанная при рендере: из полного изображения вне event loop"""
+    return await _derive(
+        task_id, result_key(task_id, size), source, image_encoder.resize, RESULT_SIZES[size], source.format
+    )
+
+
+async def _get_transcoded(task_id: str, size: str, source: StoredResult, fmt: str) -> StoredResult | None:
+    """Результат в другом формате: из хранилища или перекодирование вне event loop"""
+    cache_key = result_key(task_id, size, fmt)
+    cached = await result_store.get(cache_key)
+    if cached:
+        return cached
+    return await _derive(task_id, cache_key, source, image_encoder.encode, fmt)
+
+
+async def _derive(task_id: str, key: str, source: StoredResult, convert, *args) -> StoredResult | None:
+    """Сохранить производное изображение на оставшееся время жизни результата; None — исходник уже удален"""
+    image = await result_store.read(source)
+    if image is None:
         return None
-    return Response(content=result, media_type="image/jpeg", headers={"Content-Disposition": 'inline; filename="phantom.jpg"'},)
+    await result_store.put(key, await convert(image, *args), ttl=await _result_ttl(task_id))
+    return await result_store.get(key)
+
+
+async def _result_ttl(task_id: str) -> int:
+    ttl = await result_store.get_ttl(task_id)
+    return ttl if ttl > 0 else RESULT_TTL
+
+
+@router.get("/result/events")
+async def get_result_events(
+    request: Request,
+    task_id: str,
+    timeout: float = Query(RESULT_MAX_WAIT * 4, ge=1, le=600),
+) -> StreamingResponse:
+    """Server-Sent Events: одно событие done/failed, когда задача завершится"""
+    if await render_queue.get_state(task_id) is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    result_url = str(request.url_for("get_result").include_query_params(task_id=task_id))
+
+    async def events():
+        with result_notifier.subscribe(task_id) as finished:
+            state = await render_queue.get_state(task_id) or {}
+            status = state.get("state") if state.get("state") in (DONE, FAILED) else None
+            deadline = time.monotonic() + timeout
+            while status is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    yield "event: timeout\ndata: {}\n\n"
+                    return
+                status = await result_notifier.wait(finished, min(remaining, SSE_KEEPALIVE))
+                if status is None:
+                    yield ": keepalive\n\n"
+
+        data = {"task_id": task_id, "status": status}
+        if status == DONE:
+            data["url"] = result_url
+        yield f"event: {status}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/status")
+async def get_status(task_id: str) -> dict:
+    state = await render_queue.get_state(task_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return {"task_id": task_id, **state}
+
+
+@router.get("/stats")
+async def get_render_stats() -> dict:
+    return {**renderer.stats(), **cache.stats(), "consumer": render_consumer.stats()}
 
 
 @router.get(
@@ -90,7 +323,5 @@ async def get_result(task_id: str):
     response_class=HTMLResponse,
     responses={200: {"content": {"image/jpeg": {}}}},
 )
-async def get_generation_page() -> HTMLResponse:
-    HTML_PATH = PROJECT_ROOT / "statics" / "index.html"
-    html_content = HTML_PATH.read_text(encoding="utf-8")
-    return HTMLResponse(content=html_content, status_code=200)
+async def get_generation_page(request: Request) -> Response:
+    return INDEX_PAGE.response(request)
@@ -0,0 +1,141 @@
+import asyncio
+import io
+import json
+import time
+import uuid
+import zipfile
+from contextlib import ExitStack
+from typing import AsyncIterator, Optional
+
+from api.v1.request_models.screenshots import PhantomScreenshotBatch
+from api.v1.services.crypto_rates import get_crypto_price
+from api.v1.services.phantom import TEMPLATE_NAME, build_phantom_context, phantom_task_id, store_logo
+from api.v1.services.render_jobs import enqueue_renders, render_queue
+from api.v1.services.result_notifier import result_notifier
+from api.v1.services.results import result_store
+from config import OUTPUT_FORMAT, BATCH_ARCHIVE_TIMEOUT
+from core.caching.in_redis import cache
+from core.queue.in_redis import DONE, FAILED
+
+BATCH_TTL = 3600
+
+
+async def create_batch(batch: PhantomScreenshotBatch) -> tuple[str, list[str]]:
+    """
+    Поставить в очередь все скриншоты пачки
+
+    Курс SOL запрашивается один раз на всю пачку, задачи добавляются
+    одним pipeline. Параллельность рендера ограничивают потребители очереди.
+    Одинаковые логотипы элементов обрабатываются один раз.
+
+    Returns:
+        (batch_id, task_ids в порядке элементов запроса)
+
+    Raises:
+        QueueFullError: Пачка не помещается в очередь
+        LogoError: Логотип одного из элементов не удалось декодировать
+    """
+    batch_id = f"batch_{uuid.uuid4()}"
+    rate = await get_crypto_price("SOL", "usd")
+    items = await asyncio.gather(*(store_logo(item) for item in batch.items))
+
+    jobs = []
+    for item in items:
+        context = build_phantom_context(item, rate["price"])
+        output_format = item.output_format or OUTPUT_FORMAT
+        jobs.append((phantom_task_id(context, output_format), {
+            "ctx": context,
+            "template_name": TEMPLATE_NAME,
+            "output_format": output_format,
+            "sizes": item.sizes,
+        }))
+
+    task_ids = [task_id for task_id, _ in jobs]
+    await cache.set(_batch_key(batch_id), {"task_ids": task_ids, "created_at": time.time()}, ttl=BATCH_TTL)
+    await enqueue_renders(jobs)
+    return batch_id, task_ids
+
+
+async def get_batch_tasks(batch_id: str) -> Optional[list[str]]:
+    batch = await cache.get(_batch_key(batch_id))
+    return batch["task_ids"] if batch else None
+
+
+async def get_batch_states(task_ids: list[str]) -> dict[str, Optional[str]]:
+    return await render_queue.get_states(task_ids)
+
+
+class _ZipSink(io.RawIOBase):
+    """Несмещаемый поток для zipfile: записанные байты забираются через drain()"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_batch_archive(task_ids: list[str], timeout: float = BATCH_ARCHIVE_TIMEOUT) -> AsyncIterator[bytes]:
+    """
+    ZIP-архив пачки, который отдается по мере готовности скриншотов
+
+    Файлы пишутся в порядке завершения рендера; в конце добавляется
+    manifest.json с итоговым состоянием каждой задачи.
+    """
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED)
+    # Одинаковые элементы пачки имеют один task_id — в архив попадают один раз
+    task_ids = list(dict.fromkeys(task_ids))
+    index = {task_id: i for i, task_id in enumerate(task_ids)}
+    final_states: dict[str, Optional[str]] = {}
+
+    with ExitStack() as stack:
+        # Подписка до проверки состояний, чтобы не потерять уведомления
+        waiters = {task_id: stack.enter_context(result_notifier.subscribe(task_id)) for task_id in task_ids}
+        states = await get_batch_states(task_ids)
+        deadline = time.monotonic() + timeout
+
+        while True:
+            for task_id in task_ids:
+                if task_id in final_states:
+                    continue
+                waiter = waiters[task_id]
+                state = waiter.result() if waiter.done() else states.get(task_id)
+                if state not in (DONE, FAILED):
+                    continue
+
+                final_states[task_id] = state
+                if state == FAILED:
+                    continue
+                result = await result_store.get(task_id)
+                image = await result_store.read(result) if result is not None else None
+                if image is None:
+                    final_states[task_id] = "expired"
+                    continue
+                extension = "jpg" if result.format == "jpeg" else result.format
+                archive.writestr(f"{index[task_id]:04d}_{task_id}.{extension}", image)
+                yield sink.drain()
+
+            pending = [waiters[task_id] for task_id in task_ids if task_id not in final_states]
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+
+    manifest = [{"task_id": task_id, "state": final_states.get(task_id, "timeout")} for task_id in task_ids]
+    archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+    archive.close()
+    yield sink.drain()
+
+
+def _batch_key(batch_id: str) -> str:
+    return f"batch:{batch_id}"
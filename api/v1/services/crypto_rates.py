@@ -1,14 +1,257 @@
 import asyncio
+import time
 from typing import Dict, Any, Optional
 
 import httpx
 
-from core.caching.in_redis import cache
+from config import (
+    COINGECKO_BASE_URL,
+    COINGECKO_API_KEY,
+    PRICE_TTL,
+    PRICE_REFRESH_AHEAD,
+    PRICE_STALE_TTL,
+)
+from core.caching.in_redis import AsyncRedisCache, cache
+from core.metrics.render import SCREENSHOT_STAGE_SECONDS
 
 COINGECKO_FREE_URL = "https://api.coingecko.com/api/v3"
 COINGECKO_PRO_URL  = "https://pro-api.coingecko.com/api/v3"
 
 
+class PriceProvider:
+    """
+    Курсы CoinGecko с долгоживущим пулом соединений, single-flight
+    и stale-while-revalidate
+
+    Курс хранится в Redis дольше TTL (до PRICE_STALE_TTL) вместе со временем
+    получения. Свежий курс отдается сразу; курс старше ttl - refresh_ahead
+    тоже отдается сразу, а обновление запускается в фоне. В сеть на пути
+    запроса идет только промах по пустому кэшу, причем один запрос на тикер.
+    """
+
+    def __init__(
+        self,
+        cache: AsyncRedisCache,
+        base_url: str = COINGECKO_BASE_URL,
+        api_key: Optional[str] = COINGECKO_API_KEY,
+        ttl: int = PRICE_TTL,
+        refresh_ahead: int = PRICE_REFRESH_AHEAD,
+        stale_ttl: int = PRICE_STALE_TTL,
+        timeout: float = 10.0,
+    ):
+        """
+        Args:
+            cache: Кэш для курсов
+            base_url: Базовый URL API CoinGecko (или локальной заглушки)
+            api_key: API-ключ CoinGecko по умолчанию
+            ttl: Сколько секунд курс считается свежим
+            refresh_ahead: За сколько секунд до конца ttl обновлять в фоне
+            stale_ttl: Сколько секунд хранить курс для отдачи во время обновления
+            timeout: Таймаут HTTP-запроса
+        """
+        self.cache = cache
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.timeout = timeout
+        self._client: httpx.AsyncClient | None = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._background: set[asyncio.Task] = set()
+
+    async def start(self):
+        self._get_client()
+
+    async def close(self):
+        for task in list(self._background):
+            task.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def get_price(
+        self,
+        coin_symbol: str,
+        vs_currency: str = "usd",
+        api_key: Optional[str] = None,
+        include_24h_change: bool = False,
+        include_market_cap: bool = False,
+        include_24h_vol: bool = False,
+    ) -> dict:
+        prices = await self.get_prices(
+            [coin_symbol],
+            vs_currency,
+            api_key=api_key,
+            include_24h_change=include_24h_change,
+            include_market_cap=include_market_cap,
+            include_24h_vol=include_24h_vol,
+        )
+        return prices[coin_symbol.upper()]
+
+    async def get_prices(
+        self,
+        coin_symbols: list[str],
+        vs_currency: str = "usd",
+        api_key: Optional[str] = None,
+        include_24h_change: bool = False,
+        include_market_cap: bool = False,
+        include_24h_vol: bool = False,
+    ) -> Dict[str, dict]:
+        """
+        Курсы нескольких монет; недостающие запрашиваются одним вызовом /simple/price
+
+        Returns:
+            {"SOL": {...}, "BTC": {...}} — формат значения как у get_crypto_price
+
+        Raises:
+            ValueError:   Монета не найдена
+            httpx.HTTPStatusError: Ошибка HTTP
+        """
+        options = {
+            "vs_currency": vs_currency.lower(),
+            "api_key": api_key or self.api_key,
+            "include_24h_change": include_24h_change,
+            "include_market_cap": include_market_cap,
+            "include_24h_vol": include_24h_vol,
+        }
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in coin_symbols))
+        keys = {symbol: self._cache_key(symbol, **options) for symbol in symbols}
+
+        results: Dict[str, dict] = {}
+        missing = []
+        now = time.time()
+        for symbol in symbols:
+            entry = await self.cache.get(keys[symbol], compressed=True)
+            if entry is None:
+                missing.append(symbol)
+                continue
+            results[symbol] = entry["value"]
+            if now - entry["fetched_at"] >= self.ttl - self.refresh_ahead:
+                # Курс устаревает: отдаем как есть и обновляем в фоне
+                self._refresh_in_background([symbol], keys, options)
+
+        if missing:
+            results.update(await self._load(missing, keys, options))
+
+        return {symbol: results[symbol] for symbol in symbols}
+
+    async def warm(self, coin_symbols: list[str], vs_currency: str = "usd"):
+        """Заранее загрузить курсы, чтобы первые запросы не ждали CoinGecko"""
+        try:
+            await self.get_prices(coin_symbols, vs_currency)
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Не удалось загрузить курсы {coin_symbols}: {e}")
+
+    async def _load(self, symbols: list[str], keys: dict[str, str], options: dict) -> Dict[str, dict]:
+        """
+        Single-flight: на тикер выполняется не больше одного запроса к CoinGecko,
+        остальные вызывающие ждут его результат
+        """
+        to_request = [symbol for symbol in symbols if keys[symbol] not in self._inflight]
+        if to_request:
+            request = asyncio.ensure_future(self._request(to_request, keys, options))
+            for symbol in to_request:
+                self._inflight[keys[symbol]] = request
+                request.add_done_callback(lambda _, key=keys[symbol]: self._inflight.pop(key, None))
+
+        requests = {symbol: self._inflight[keys[symbol]] for symbol in symbols}
+        results = {}
+        for symbol, request in requests.items():
+            fetched = await asyncio.shield(request)
+            if symbol not in fetched:
+                raise ValueError(
+                    f"Монета с тикером '{symbol}' не найдена на CoinGecko. "
+                    "Проверьте правильность символа."
+                )
+            results[symbol] = fetched[symbol]
+        return results
+
+    def _refresh_in_background(self, symbols: list[str], keys: dict[str, str], options: dict):
+        if all(keys[symbol] in self._inflight for symbol in symbols):
+            return
+        task = asyncio.create_task(self._load(symbols, keys, options))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Ошибка фонового обновления курса: {task.exception()}")
+
+    async def _request(self, symbols: list[str], keys: dict[str, str], options: dict) -> Dict[str, dict]:
+        api_key = options["api_key"]
+        base_url = COINGECKO_PRO_URL if api_key and self.base_url == COINGECKO_FREE_URL else self.base_url
+
+        headers = {}
+        if api_key:
+            # Demo key: x-cg-demo-api-key | Pro key: x-cg-pro-api-key
+            headers["x-cg-demo-api-key"] = api_key
+
+        cur = options["vs_currency"]
+        params: dict = {
+            "symbols": ",".join(symbol.lower() for symbol in symbols),
+            "vs_currencies": cur,
+            "include_24hr_change": str(options["include_24h_change"]).lower(),
+            "include_market_cap": str(options["include_market_cap"]).lower(),
+            "include_24hr_vol": str(options["include_24h_vol"]).lower(),
+        }
+
+        response = await self._get_client().get(
+            f"{base_url}/simple/price",
+            params=params,
+            headers=headers,
+        )
+        response.raise_for_status()
+        data: dict = response.json()
+
+        results = {}
+        for symbol in symbols:
+            # Ответ: {"sol": {"usd": 87500.12, "usd_24h_change": 1.45, ...}}
+            coin_data = data.get(symbol.lower())
+            if coin_data is None and len(symbols) == 1 and data:
+                coin_data = next(iter(data.values()))
+            if coin_data is None:
+                continue
+
+            result = {
+                "symbol": symbol,
+                "vs_currency": cur.upper(),
+                "price": coin_data.get(cur),
+            }
+            if options["include_24h_change"]:
+                result["change_24h"] = coin_data.get(f"{cur}_24h_change")
+            if options["include_market_cap"]:
+                result["market_cap"] = coin_data.get(f"{cur}_market_cap")
+            if options["include_24h_vol"]:
+                result["vol_24h"] = coin_data.get(f"{cur}_24h_vol")
+
+            results[symbol] = result
+            await self.cache.set(
+                keys[symbol],
+                {"value": result, "fetched_at": time.time()},
+                compress=True,
+                ttl=self.stale_ttl,
+            )
+
+        return results
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=300),
+            )
+        return self._client
+
+    @staticmethod
+    def _cache_key(symbol: str, vs_currency: str, api_key: Optional[str], **flags: bool) -> str:
+        enabled = [name.removeprefix("include_") for name, value in sorted(flags.items()) if value]
+        return ":".join(["price", symbol.lower(), vs_currency, *enabled])
+
+
+price_provider = PriceProvider(cache)
+
 
 async def get_crypto_price(
     coin_symbol: str,
@@ -24,7 +267,7 @@ async def get_crypto_price(
     Args:
         coin_symbol:        Тикер монеты (e.g. 'BTC', 'ETH', 'SOL')
         vs_currency:        Котируемая валюта (e.g. 'usd', 'eur', 'btc', 'eth')
-        api_key:            API-ключ CoinGecko (Demo или Pro); None — бесплатный
+        api_key:            API-ключ CoinGecko (Demo или Pro); None — из config
         include_24h_change: Включить изменение цены за 24ч (%)
         include_market_cap: Включить рыночную капитализацию
         include_24h_vol:    Включить объём торгов за 24ч
@@ -43,61 +286,16 @@ async def get_crypto_price(
         ValueError:   Монета не найдена
         httpx.HTTPStatusError: Ошибка HTTP
     """
-    cache_key = f"{coin_symbol.lower()}_price_{vs_currency.lower()}"
-    cached_rate = await cache.get(cache_key, compressed=True)
-    if cached_rate:
-        return cached_rate
-    base_url = COINGECKO_PRO_URL if api_key else COINGECKO_FREE_URL
-
-    headers = {}
-    if api_key:
-        # Demo key: x-cg-demo-api-key | Pro key: x-cg-pro-api-key
-        headers["x-cg-demo-api-key"] = api_key
-
-    params: dict = {
-        "symbols": coin_symbol.lower(),
-        "vs_currencies": vs_currency.lower(),
-        "include_24hr_change": str(include_24h_change).lower(),
-        "include_market_cap": str(include_market_cap).lower(),
-        "include_24hr_vol": str(include_24h_vol).lower(),
-    }
-
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        response = await client.get(
-            f"{base_url}/simple/price",
-            params=params,
-            headers=headers,
-        )
-        response.raise_for_status()
-        data: dict = response.json()
-
-    if not data:
-        raise ValueError(
-            f"Монета с тикером '{coin_symbol.upper()}' не найдена на CoinGecko. "
-            "Проверьте правильность символа."
+    with SCREENSHOT_STAGE_SECONDS.time(stage="price_lookup"):
+        return await price_provider.get_price(
+            coin_symbol,
+            vs_currency,
+            api_key=api_key,
+            include_24h_change=include_24h_change,
+            include_market_cap=include_market_cap,
+            include_24h_vol=include_24h_vol,
         )
 
-    # Ответ: {"bitcoin": {"usd": 87500.12, "usd_24h_change": 1.45, ...}}
-    coin_data: dict = next(iter(data.values()))
-    cur = vs_currency.lower()
-
-    result = {
-        "symbol": coin_symbol.upper(),
-        "vs_currency": vs_currency.upper(),
-        "price": coin_data.get(cur),
-    }
-
-    if include_24h_change:
-        result["change_24h"] = coin_data.get(f"{cur}_24h_change")
-    if include_market_cap:
-        result["market_cap"] = coin_data.get(f"{cur}_market_cap")
-    if include_24h_vol:
-        result["vol_24h"] = coin_data.get(f"{cur}_24h_vol")
-
-    if result:
-        await cache.set(cache_key, result, compress=True, ttl=3600)
-
-    return result
 
 if __name__ == "__main__":
     print(asyncio.run(get_crypto_price("SOL", "usd")))  # Example usage
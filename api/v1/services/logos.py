@@ -0,0 +1,95 @@
+import base64
+import binascii
+import hashlib
+from urllib.parse import unquote_to_bytes
+
+from config import LOGO_SIZE, LOGO_MAX_BYTES, LOGO_TTL
+from core.browser.assets import ASSET_HOST
+from core.caching.in_redis import cache
+from core.imaging.encoder import THUMBNAIL_FORMAT, image_encoder, probe_image
+
+# Логотипы доступны странице рендера по адресу ASSET_HOST + logos/<sha256>.<ext>
+LOGO_PREFIX = "logos/"
+
+# Форматы, которые Pillow не декодирует: сохраняются как есть
+_PASSTHROUGH_EXTENSIONS = {"image/svg+xml": "svg"}
+
+
+class LogoError(ValueError):
+    """Логотип не удалось декодировать или он больше LOGO_MAX_BYTES"""
+
+
+def decode_data_uri(data_uri: str) -> tuple[str, bytes]:
+    """
+    Разобрать data URI картинки
+
+    Returns:
+        (media type, содержимое)
+
+    Raises:
+        LogoError: Не data:image/... URI, поврежденный base64 или слишком большой размер
+    """
+    header, sep, payload = data_uri.partition(",")
+    if not sep or not header.startswith("data:image/"):
+        raise LogoError("token_logo должен быть data URI (data:image/...)")
+    media_type, *params = header[len("data:"):].split(";")
+
+    base64_encoded = "base64" in params
+    # Размер проверяется до декодирования: base64 длиннее данных в 4/3 раза
+    approx_size = len(payload) * 3 // 4 if base64_encoded else len(payload)
+    if approx_size > LOGO_MAX_BYTES:
+        raise LogoError(f"token_logo больше {LOGO_MAX_BYTES} байт")
+
+    if not base64_encoded:
+        return media_type, unquote_to_bytes(payload)
+    try:
+        return media_type, base64.b64decode(payload, validate=True)
+    except binascii.Error as e:
+        raise LogoError(f"token_logo: некорректный base64 ({e})") from e
+
+
+async def ingest_logo(data_uri: str) -> str:
+    """
+    Обработать логотип один раз и вернуть ссылку на него для страницы рендера
+
+    Картинка декодируется, обрезается до квадрата LOGO_SIZE и перекодируется
+    в пуле процессов, а результат хранится в кэше по хэшу исходника:
+    повторная загрузка того же логотипа не выполняет эту работу. Вместо
+    base64 в HTML и в ключ рендера попадает короткий URL.
+
+    Raises:
+        LogoError: Логотип не удалось разобрать или декодировать
+    """
+    media_type, data = decode_data_uri(data_uri)
+    if media_type not in _PASSTHROUGH_EXTENSIONS:
+        # Явно не картинка — 422 сразу, без блокировки в Redis и пула процессов
+        try:
+            probe_image(data)
+        except Exception as e:
+            raise LogoError(f"token_logo: не удалось декодировать картинку ({e})") from e
+    extension = _PASSTHROUGH_EXTENSIONS.get(media_type, THUMBNAIL_FORMAT)
+    name = f"{LOGO_PREFIX}{hashlib.sha256(data).hexdigest()}.{extension}"
+
+    async def _process() -> bytes:
+        if media_type in _PASSTHROUGH_EXTENSIONS:
+            return data
+        try:
+            return await image_encoder.thumbnail(data, LOGO_SIZE)
+        except Exception as e:
+            raise LogoError(f"token_logo: не удалось декодировать картинку ({e})") from e
+
+    key = _logo_key(name)
+    # Если картинка все же не декодируется, get_or_set отпускает блокировку при ошибке
+    await cache.get_or_set(key, _process, ttl=LOGO_TTL, raw=True, lock=True)
+    # Логотип должен дожить до рендера, даже если был загружен почти LOGO_TTL назад
+    await cache.refresh_ttl(key, LOGO_TTL)
+    return ASSET_HOST + name
+
+
+async def load_logo(name: str) -> bytes | None:
+    """Загрузчик AssetStore: обработанный логотип из кэша по имени ассета"""
+    return await cache.get(_logo_key(name), raw=True)
+
+
+def _logo_key(name: str) -> str:
+    return f"logo:{name.removeprefix(LOGO_PREFIX)}"
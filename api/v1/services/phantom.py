@@ -0,0 +1,80 @@
+import datetime
+import random
+
+from api.v1.request_models.screenshots import PhantomScreenshot
+from api.v1.services.logos import ingest_logo
+from api.v1.services.screenshot_generator import content_key
+
+TEMPLATE_NAME = "phantom_wallet.html"
+
+# Типичный запрос для прогревочного рендера при запуске
+WARMUP_REQUEST = PhantomScreenshot(
+    domain="solpulse.dev",
+    name="PEPE",
+    amount="150K",
+    multiplier="14.2",
+    usdt_amount=921.62,
+    token_name="Ethereum",
+    token_ticker="ETH",
+    token_amount=102.82,
+    usd_price_per_token=0.0000284,
+    seed=0,
+)
+WARMUP_SOL_PRICE = 150.0
+
+
+async def store_logo(ctx: PhantomScreenshot) -> PhantomScreenshot:
+    """
+    Запрос, в котором token_logo заменен ссылкой на обработанный логотип
+
+    Raises:
+        LogoError: Логотип не удалось декодировать
+    """
+    if not ctx.token_logo:
+        return ctx
+    return ctx.model_copy(update={"token_logo": await ingest_logo(ctx.token_logo)})
+
+
+def build_phantom_context(ctx: PhantomScreenshot, sol_price: float) -> dict:
+    """
+    Контекст шаблона phantom_wallet.html: данные запроса плюс
+    случайные балансы SOL/USDT и изменения за день
+
+    При заданном ctx.seed случайные поля воспроизводимы.
+
+    Args:
+        ctx: Данные запроса
+        sol_price: Курс SOL в USD
+    """
+    rng = random.Random(ctx.seed) if ctx.seed is not None else random
+    context = ctx.model_dump(exclude={"output_format", "seed", "sizes"})
+    context["solana_amount_usdt"] = round(rng.uniform(500, 3000), 2)
+    context["solana_amount"] = f"{round(context["solana_amount_usdt"] / sol_price, 2):.2f}"
+    context["solana_amount_change"] = round(rng.uniform(0.01, 2) * rng.choice([-1, 1]), 2)
+    context["usdt_amount_change"] = round(rng.uniform(0.01, 0.05) * rng.choice([-1, 1]), 2)
+    context["current_time"] = datetime.datetime.utcnow().strftime("%H:%M")
+    context["token_amount_usd"] = round(ctx.token_amount * ctx.usd_price_per_token, 2)
+    context["token_change"] = round(rng.uniform(0.01, 1) * rng.choice([-1, 1]), 2)
+    context["total_diff"] = context["solana_amount_change"] + context["usdt_amount_change"] + context["token_change"]
+    context["total"] = context["solana_amount_usdt"] + context["usdt_amount"] + context["token_amount_usd"]
+    context["total_diff_percent"] = f'{round(context["total_diff"] / context["total"] * 100, 2):.2f}'
+    context["token_change"] = f'{context["token_change"]:.2f}'
+    context["solana_amount_change"] = f'{context["solana_amount_change"]:.2f}'
+    context["usdt_amount_change"] = f'{context["usdt_amount_change"]:.2f}'
+    context["solana_amount_usdt"] = f"{round(rng.uniform(500, 3000), 2):.2f}"
+    context["token_amount"] = f"{ctx.token_amount:.2f}"
+    context["usdt_amount"] = f"{ctx.usdt_amount:.2f}"
+    context["token_amount_usd"] = f"{context["token_amount_usd"]:.2f}"
+    context["total_diff"] = f'{context["total_diff"]:.2f}'
+    context["total"] = f'{context["total"]:.2f}'
+    return context
+
+
+def phantom_task_id(context: dict, output_format: str) -> str:
+    """Идентификатор задачи — хэш содержимого: одинаковые запросы указывают на один рендер"""
+    return f"phantom_{content_key(context, TEMPLATE_NAME, output_format)}"
+
+
+def warmup_contexts() -> dict[str, dict]:
+    """Контексты прогревочного рендера по имени шаблона"""
+    return {TEMPLATE_NAME: build_phantom_context(WARMUP_REQUEST, WARMUP_SOL_PRICE)}
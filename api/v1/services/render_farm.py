@@ -0,0 +1,249 @@
+import asyncio
+import itertools
+import multiprocessing
+import threading
+from dataclasses import dataclass
+from multiprocessing.process import BaseProcess
+from multiprocessing.queues import Queue
+
+from api.v1.services.screenshot_generator import is_overload_error, screenshot_service
+from config import RENDER_WORKERS, OUTPUT_FORMAT
+from core.metrics.latency import LatencyStats
+from core.metrics.render import RENDERS_IN_FLIGHT
+
+_mp = multiprocessing.get_context("spawn")
+
+
+class WorkerCrashedError(RuntimeError):
+    """Процесс-воркер упал, не вернув результат рендера"""
+
+
+class RenderOverloadError(RuntimeError):
+    """Рендер в воркере не удался из-за перегрузки: таймаут или упавший Chromium"""
+
+
+@dataclass
+class _WarmupJob:
+    """Прогревочный рендер в воркере; следующие задачи ждут его завершения"""
+    job_id: int
+    contexts: dict[str, dict]
+
+
+def _worker_main(worker_id: int, jobs: Queue, results: Queue):
+    """Точка входа процесса-воркера: свой Chromium, свой event loop"""
+    asyncio.run(_worker_loop(worker_id, jobs, results))
+
+
+async def _worker_loop(worker_id: int, jobs: Queue, results: Queue):
+    loop = asyncio.get_running_loop()
+    await screenshot_service.start()
+
+    async def _run(
+            job_id: int,
+            ctx: dict,
+            template_name: str,
+            task_id: str,
+            output_format: str,
+            sizes: list[str],
+            store: bool,
+    ):
+        try:
+            image = await screenshot_service.render_screenshot(ctx, template_name, task_id, output_format, sizes, store)
+            results.put((worker_id, job_id, image, None, False))
+        except Exception as e:
+            # Исключения Playwright не переносятся между процессами — передаем признак перегрузки
+            results.put((worker_id, job_id, None, f"{type(e).__name__}: {e}", is_overload_error(e)))
+
+    running: set[asyncio.Task] = set()
+    try:
+        while True:
+            job = await loop.run_in_executor(None, jobs.get)
+            if job is None:
+                break
+            if isinstance(job, _WarmupJob):
+                try:
+                    await screenshot_service.warmup(job.contexts)
+                    results.put((worker_id, job.job_id, b"", None, False))
+                except Exception as e:
+                    results.put((worker_id, job.job_id, None, f"{type(e).__name__}: {e}", is_overload_error(e)))
+                continue
+            # Параллельность внутри воркера ограничивает пул страниц
+            task = asyncio.create_task(_run(*job))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running)
+    finally:
+        await screenshot_service.stop()
+
+
+class _Worker:
+    def __init__(self, worker_id: int):
+        self.id = worker_id
+        self.jobs: Queue = _mp.Queue()
+        self.pending: dict[int, asyncio.Future] = {}
+        self.restarts = 0
+        self.process: BaseProcess | None = None
+
+
+class RenderWorkerFarm:
+    """
+    Пул процессов-рендереров, каждый со своим Chromium из ScreenshotService.start()
+
+    Задачи отправляются воркеру с наименьшей очередью; упавший воркер
+    перезапускается, а его незавершенные задачи завершаются WorkerCrashedError.
+    """
+
+    def __init__(self, workers: int, monitor_interval: float = 1.0):
+        """
+        Args:
+            workers: Количество процессов-воркеров
+            monitor_interval: Период проверки живости воркеров в секундах
+        """
+        self.workers = workers
+        self.monitor_interval = monitor_interval
+        self.render_stats = LatencyStats()
+        self._workers: list[_Worker] = []
+        self._results: Queue | None = None
+        self._job_ids = itertools.count()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._reader: threading.Thread | None = None
+        self._monitor_task: asyncio.Task | None = None
+        # Контексты прогрева; перезапущенный воркер прогревается ими же
+        self._warmup_contexts: dict[str, dict] | None = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._results = _mp.Queue()
+        self._workers = [_Worker(i) for i in range(self.workers)]
+        for worker in self._workers:
+            self._spawn(worker)
+
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+        self._monitor_task = asyncio.create_task(self._monitor())
+
+    async def stop(self):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+
+        for worker in self._workers:
+            worker.jobs.put(None)
+        for worker in self._workers:
+            await asyncio.to_thread(worker.process.join, 30)
+            if worker.process.is_alive():
+                worker.process.kill()
+            self._fail_pending(worker, "воркер остановлен")
+
+        if self._results is not None:
+            self._results.put(None)
+            await asyncio.to_thread(self._reader.join)
+
+    async def warmup(self, contexts: dict[str, dict]):
+        """Прогреть все воркеры и дождаться завершения"""
+        self._warmup_contexts = contexts
+        await asyncio.gather(*(self._send_warmup(worker) for worker in self._workers))
+
+    async def render_screenshot(
+            self,
+            ctx: dict,
+            template_name: str,
+            task_id: str,
+            output_format: str = OUTPUT_FORMAT,
+            sizes: list[str] | None = None,
+            store: bool = True,
+    ) -> bytes:
+        worker = min(self._workers, key=lambda w: len(w.pending))
+        job_id = next(self._job_ids)
+        future = self._loop.create_future()
+        worker.pending[job_id] = future
+
+        with self.render_stats.time():
+            worker.jobs.put((job_id, ctx, template_name, task_id, output_format, sizes or [], store))
+            return await future
+
+    @property
+    def inflight(self) -> int:
+        """Рендеры, отправленные воркерам и еще не завершенные"""
+        return sum(len(worker.pending) for worker in self._workers)
+
+    def stats(self) -> dict:
+        return {
+            "render": self.render_stats.snapshot(),
+            "workers": [
+                {
+                    "id": worker.id,
+                    "pid": worker.process.pid if worker.process else None,
+                    "alive": bool(worker.process and worker.process.is_alive()),
+                    "queue_depth": len(worker.pending),
+                    "restarts": worker.restarts,
+                }
+                for worker in self._workers
+            ],
+        }
+
+    def _spawn(self, worker: _Worker):
+        worker.process = _mp.Process(
+            target=_worker_main,
+            args=(worker.id, worker.jobs, self._results),
+            name=f"render-worker-{worker.id}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.monitor_interval)
+            for worker in self._workers:
+                if worker.process.is_alive():
+                    continue
+                print(f"Воркер рендера {worker.id} упал (exitcode={worker.process.exitcode}), перезапуск")
+                self._fail_pending(worker, f"воркер {worker.id} упал")
+                # Задачи в старой очереди уже учтены как упавшие
+                worker.jobs = _mp.Queue()
+                worker.restarts += 1
+                self._spawn(worker)
+                if self._warmup_contexts is not None:
+                    # Прогрев перезапущенного воркера не ждем; задачи встанут в очередь после него
+                    self._send_warmup(worker).add_done_callback(lambda f: f.exception())
+
+    def _send_warmup(self, worker: _Worker) -> asyncio.Future:
+        job_id = next(self._job_ids)
+        future = self._loop.create_future()
+        worker.pending[job_id] = future
+        worker.jobs.put(_WarmupJob(job_id, self._warmup_contexts))
+        return future
+
+    def _fail_pending(self, worker: _Worker, reason: str):
+        pending, worker.pending = worker.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(WorkerCrashedError(reason))
+
+    def _read_results(self):
+        """Поток-читатель общей очереди результатов"""
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            self._loop.call_soon_threadsafe(self._resolve, *item)
+
+    def _resolve(self, worker_id: int, job_id: int, image: bytes | None, error: str | None, overload: bool):
+        future = self._workers[worker_id].pending.pop(job_id, None)
+        if future is None or future.done():
+            return
+        if error is not None:
+            future.set_exception(RenderOverloadError(error) if overload else RuntimeError(error))
+        else:
+            future.set_result(image)
+
+
+render_farm = RenderWorkerFarm(RENDER_WORKERS)
+
+# Рендерер, которым пользуется API: отдельные процессы или Chromium в текущем процессе
+renderer = render_farm if RENDER_WORKERS > 0 else screenshot_service
+RENDERS_IN_FLIGHT.set_function(lambda: renderer.inflight)
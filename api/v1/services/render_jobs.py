@@ -0,0 +1,260 @@
+import asyncio
+import collections
+import os
+import socket
+import time
+
+from api.v1.services.render_farm import RenderOverloadError, WorkerCrashedError, renderer
+from api.v1.services.result_notifier import result_notifier
+from api.v1.services.results import result_store
+from api.v1.services.screenshot_generator import is_overload_error
+from config import (
+    JOB_STREAM,
+    JOB_GROUP,
+    JOB_QUEUE_MAX_LENGTH,
+    JOB_BATCH_STREAM,
+    JOB_BATCH_QUEUE_MAX_LENGTH,
+    JOB_CLAIM_IDLE_MS,
+    JOB_MAX_DELIVERIES,
+    RENDER_CONCURRENCY,
+    RENDER_CONCURRENCY_MIN,
+    RENDER_TARGET_LATENCY,
+    OUTPUT_FORMAT,
+)
+from core.caching.in_redis import cache
+from core.metrics.prometheus import registry
+from core.queue.admission import AIMDLimit
+from core.queue.in_redis import AsyncRedisStreamQueue, StreamJob, read_any, RENDERING, DONE, FAILED
+
+# Полосы приоритета: интерактивные запросы веб-интерфейса и пакетные задачи
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+render_queue = AsyncRedisStreamQueue(cache, JOB_STREAM, JOB_GROUP, JOB_QUEUE_MAX_LENGTH)
+batch_queue = AsyncRedisStreamQueue(cache, JOB_BATCH_STREAM, JOB_GROUP, JOB_BATCH_QUEUE_MAX_LENGTH)
+# Очереди в порядке приоритета; статусы задач общие, поэтому render_queue.get_state видит все
+LANES = {INTERACTIVE: render_queue, BATCH: batch_queue}
+
+
+async def enqueue_render(
+        ctx: dict,
+        template_name: str,
+        task_id: str,
+        output_format: str = OUTPUT_FORMAT,
+        lane: str = INTERACTIVE,
+        sizes: list[str] | None = None,
+) -> bool:
+    """
+    Поставить рендер в очередь полосы lane
+
+    task_id — хэш содержимого, поэтому готовый результат или такая же
+    задача в очереди означают, что рендерить повторно не нужно.
+
+    Returns:
+        True, если задача добавлена; False, если результат уже есть или задача уже в очереди
+
+    Raises:
+        QueueFullError: Очередь заполнена
+    """
+    if await result_store.exists(task_id):
+        await render_queue.set_state(task_id, DONE)
+        return False
+
+    message_id = await LANES[lane].enqueue(
+        task_id,
+        {"ctx": ctx, "template_name": template_name, "output_format": output_format, "sizes": sizes or []},
+        unique=True,
+    )
+    return message_id is not None
+
+
+async def enqueue_renders(jobs: list[tuple[str, dict]], lane: str = BATCH) -> int:
+    """
+    Поставить в очередь пачку рендеров, пропуская готовые и уже поставленные
+
+    Args:
+        jobs: Пары (task_id, payload с ctx, template_name, output_format, sizes)
+        lane: Полоса приоритета, по умолчанию пакетная
+
+    Returns:
+        Сколько задач добавлено
+
+    Raises:
+        QueueFullError: Пачка не помещается в очередь
+    """
+    jobs = list(dict(jobs).items())
+    rendered = await asyncio.gather(*(result_store.exists(task_id) for task_id, _ in jobs))
+    for (task_id, _), exists in zip(jobs, rendered):
+        if exists:
+            await render_queue.set_state(task_id, DONE)
+    pending = [job for job, exists in zip(jobs, rendered) if not exists]
+    return len(await LANES[lane].enqueue_many(pending, unique=True))
+
+
+class RenderJobConsumer:
+    """
+    Потребитель очередей рендера: читает задачи из стримов и отдает их рендереру
+
+    Очереди перечислены по приоритету: задачи из следующей берутся, только
+    когда в предыдущих нет новых. Число одновременных задач ограничивает
+    адаптивный лимит (AIMD по латентности рендера): при перегрузке задачи
+    остаются в стримах, а не копятся в памяти и Chromium.
+    """
+
+    def __init__(
+        self,
+        queues: list[AsyncRedisStreamQueue],
+        concurrency: int = RENDER_CONCURRENCY,
+        min_concurrency: int = RENDER_CONCURRENCY_MIN,
+        target_latency: float = RENDER_TARGET_LATENCY,
+        claim_interval: float = 5.0,
+    ):
+        """
+        Args:
+            queues: Очереди задач в порядке приоритета (одно соединение и consumer group)
+            concurrency: Максимум одновременно выполняемых задач
+            min_concurrency: Нижняя граница адаптивного лимита
+            target_latency: Латентность рендера в секундах, выше которой лимит снижается
+            claim_interval: Период поиска задач упавших потребителей в секундах
+        """
+        self.queues = queues
+        self.limit = AIMDLimit(concurrency, min_concurrency, concurrency, target_latency)
+        self.claim_interval = claim_interval
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self._running: set[asyncio.Task] = set()
+        # Задачи, которые read_any доставил сверх свободных слотов: запускаются первыми
+        self._buffered: collections.deque[tuple[AsyncRedisStreamQueue, StreamJob]] = collections.deque()
+        self._loop_task: asyncio.Task | None = None
+        self._stopping = False
+
+    async def start(self):
+        for queue in self.queues:
+            await queue.ensure_group()
+        self._stopping = False
+        self._loop_task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Перестать брать задачи и дождаться выполняемых"""
+        self._stopping = True
+        if self._loop_task:
+            await self._loop_task
+        if self._running:
+            await asyncio.gather(*self._running, return_exceptions=True)
+
+    async def run(self):
+        last_claim = 0.0
+        while not self._stopping:
+            if len(self._running) >= self.limit.limit:
+                await asyncio.wait(self._running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+
+            try:
+                jobs = []
+                if time.monotonic() - last_claim >= self.claim_interval:
+                    last_claim = time.monotonic()
+                    jobs = await self._claim_stale(self.limit.limit - len(self._running))
+                jobs += await self._read(self.limit.limit - len(self._running) - len(jobs))
+            except Exception as e:
+                print(f"Ошибка чтения очередей рендера: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for queue, job in jobs:
+                task = asyncio.create_task(self._process(queue, job))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+
+    async def _claim_stale(self, free: int) -> list[tuple[AsyncRedisStreamQueue, StreamJob]]:
+        jobs = []
+        for queue in self.queues:
+            if free - len(jobs) <= 0:
+                break
+            claimed = await queue.claim_stale(self.name, JOB_CLAIM_IDLE_MS, free - len(jobs))
+            # Своя задача из буфера тоже числится в PEL и могла простоять дольше JOB_CLAIM_IDLE_MS
+            buffered = {job.message_id for buffered_queue, job in self._buffered if buffered_queue is queue}
+            jobs.extend((queue, job) for job in claimed if job.message_id not in buffered)
+        return jobs
+
+    async def _read(self, free: int) -> list[tuple[AsyncRedisStreamQueue, StreamJob]]:
+        """Отложенные и новые задачи по приоритету очередей; если все пусты — ждать задачу в любой"""
+        if free <= 0:
+            return []
+        jobs = []
+        while self._buffered and len(jobs) < free:
+            jobs.append(self._buffered.popleft())
+        for queue in self.queues:
+            if free - len(jobs) <= 0:
+                break
+            read = await queue.read(self.name, count=free - len(jobs), block_ms=None)
+            jobs.extend((queue, job) for job in read)
+        if jobs:
+            return jobs
+        jobs = await read_any(self.queues, self.name)
+        # Лишние задачи уже доставлены этому потребителю — не теряем их до освобождения слота
+        self._buffered.extend(jobs[free:])
+        return jobs[:free]
+
+    async def _process(self, queue: AsyncRedisStreamQueue, job: StreamJob):
+        if job.deliveries > JOB_MAX_DELIVERIES:
+            await self._finish(queue, job, FAILED, error="превышено число попыток")
+            return
+
+        await queue.set_state(job.job_id, RENDERING, consumer=self.name, attempt=job.deliveries)
+        started = time.monotonic()
+        try:
+            await renderer.render_screenshot(
+                job.payload["ctx"],
+                template_name=job.payload["template_name"],
+                task_id=job.job_id,
+                output_format=job.payload.get("output_format", OUTPUT_FORMAT),
+                sizes=job.payload.get("sizes"),
+            )
+        except WorkerCrashedError as e:
+            # Упавший воркер — признак перегрузки: снижаем лимит
+            self.limit.observe(started, time.monotonic() - started, failed=True)
+            # Не подтверждаем: задачу заберет claim_stale после JOB_CLAIM_IDLE_MS
+            print(f"Задача {job.job_id} потеряна упавшим воркером: {e}")
+            return
+        except Exception as e:
+            # Лимит снижают только таймауты и падения Chromium: плохие входные данные
+            # (контекст, шаблон, логотип) не должны урезать параллельность для всех
+            overload = isinstance(e, RenderOverloadError) or is_overload_error(e)
+            self.limit.observe(started, time.monotonic() - started, failed=overload)
+            await self._finish(queue, job, FAILED, error=str(e))
+            return
+
+        self.limit.observe(started, time.monotonic() - started)
+        await self._finish(queue, job, DONE)
+
+    async def _finish(self, queue: AsyncRedisStreamQueue, job: StreamJob, state: str, **fields):
+        await queue.set_state(job.job_id, state, **fields)
+        await queue.ack(job)
+        await result_notifier.publish(job.job_id, state)
+
+    def stats(self) -> dict:
+        return {"running": len(self._running), "buffered": len(self._buffered), "concurrency": self.limit.stats()}
+
+
+render_consumer = RenderJobConsumer(list(LANES.values()))
+
+RENDER_QUEUE_LENGTH = registry.gauge(
+    "render_queue_length",
+    "Задачи в очереди рендера (ожидающие и выполняемые всеми потребителями)",
+    ("lane",),
+)
+RENDER_JOBS_RUNNING = registry.gauge(
+    "render_jobs_running",
+    "Задачи, которые сейчас выполняет потребитель этого процесса",
+)
+RENDER_JOBS_RUNNING.set_function(lambda: len(render_consumer._running))
+RENDER_CONCURRENCY_LIMIT = registry.gauge(
+    "render_concurrency_limit",
+    "Текущий адаптивный лимит одновременных задач потребителя этого процесса",
+)
+RENDER_CONCURRENCY_LIMIT.set_function(lambda: render_consumer.limit.limit)
+
+
+@registry.collector
+async def _collect_queue_length():
+    for lane, queue in LANES.items():
+        RENDER_QUEUE_LENGTH.set(await queue.length(), lane=lane)
@@ -0,0 +1,69 @@
+import asyncio
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterator
+
+from config import RESULT_CHANNEL
+from core.caching.in_redis import AsyncRedisCache, cache
+from core.queue.in_redis import DONE, FAILED
+
+
+class ResultNotifier:
+    """
+    Ожидание завершения рендера через Redis pub/sub вместо опроса
+
+    Потребитель очереди публикует "done:<task_id>" или "failed:<task_id>"
+    в канал; процесс API держит одну подписку и будит ожидающие запросы.
+    """
+
+    def __init__(self, cache: AsyncRedisCache, channel: str):
+        self.cache = cache
+        self.channel = channel
+        self._waiters: dict[str, set[asyncio.Future]] = defaultdict(set)
+
+    async def start(self):
+        await self.cache.subscribe_invalidation(self.channel, self._on_message)
+
+    async def publish(self, task_id: str, status: str):
+        await self.cache.publish_invalidation(self.channel, f"{status}:{task_id}")
+
+    @contextmanager
+    def subscribe(self, task_id: str) -> Iterator[asyncio.Future]:
+        """
+        Зарегистрировать ожидание задачи
+
+        Подписываться нужно до проверки результата в кэше, иначе
+        уведомление, пришедшее между проверкой и подпиской, потеряется.
+
+        Yields:
+            Future, который завершится статусом задачи ("done" / "failed")
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[task_id].add(future)
+        try:
+            yield future
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self._waiters[task_id]
+
+    @staticmethod
+    async def wait(future: asyncio.Future, timeout: float) -> str | None:
+        """Дождаться статуса задачи или вернуть None по таймауту"""
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def _on_message(self, message: str):
+        status, _, task_id = message.partition(":")
+        if status not in (DONE, FAILED):
+            return
+        for future in self._waiters.get(task_id, ()):
+            if not future.done():
+                future.set_result(status)
+
+
+result_notifier = ResultNotifier(cache, RESULT_CHANNEL)
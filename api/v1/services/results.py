@@ -0,0 +1,113 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from config import BLOB_STORE_DIR, BLOB_STORE_MAX_BYTES, BLOB_STORE_MAX_AGE, BLOB_STORE_EVICT_INTERVAL
+from core.caching.in_redis import AsyncRedisCache, cache
+from core.imaging.encoder import sniff_format
+from core.storage.blob_store import BlobStore
+
+# Время жизни результата рендера в секундах
+RESULT_TTL = 3600
+
+# Результат в исходном разрешении; остальные размеры — RESULT_SIZES
+FULL_SIZE = "full"
+
+
+def result_key(task_id: str, size: str = FULL_SIZE, output_format: str | None = None) -> str:
+    """Ключ кэша результата рендера, его уменьшенной копии или перекодированного варианта"""
+    parts = [task_id]
+    if size != FULL_SIZE:
+        parts.append(size)
+    if output_format is not None:
+        parts.append(output_format)
+    return ":".join(parts)
+
+
+@dataclass(frozen=True)
+class StoredResult:
+    """Изображение в хранилище: хэш содержимого, формат и файл, который можно отдать как есть"""
+    digest: str
+    format: str
+    path: Path
+    stat: os.stat_result
+
+
+class ResultStore:
+    """
+    Результаты рендера: байты — файлами в BlobStore, в Redis — указатели
+
+    Указатель {"blob", "size", "format"} занимает десятки байт, поэтому
+    память Redis не растет с числом и размером изображений. Указатель на
+    удаленный очисткой файл считается отсутствующим результатом.
+    """
+
+    def __init__(self, cache: AsyncRedisCache, blobs: BlobStore):
+        self.cache = cache
+        self.blobs = blobs
+
+    async def start(self):
+        await self.blobs.start()
+
+    async def stop(self):
+        await self.blobs.stop()
+
+    async def put_many(self, items: dict[str, bytes], ttl: int = RESULT_TTL):
+        """Записать изображения в хранилище, затем указатели на них — одной транзакцией Redis"""
+        digests = await asyncio.to_thread(lambda: [self.blobs.put(data) for data in items.values()])
+        await self.cache.set_many(
+            {
+                key: {"blob": digest, "size": len(data), "format": sniff_format(data) or "jpeg"}
+                for (key, data), digest in zip(items.items(), digests)
+            },
+            ttl=ttl,
+        )
+
+    async def put(self, key: str, data: bytes, ttl: int = RESULT_TTL):
+        await self.put_many({key: data}, ttl=ttl)
+
+    async def get(self, key: str) -> StoredResult | None:
+        """Указатель на изображение, если и он, и файл существуют"""
+        try:
+            pointer = await self.cache.get(key)
+        except ValueError:
+            # Под тем же ключом может лежать изображение в старом формате (байты, не JSON)
+            return None
+        if not isinstance(pointer, dict) or "blob" not in pointer:
+            return None
+        stat = self.blobs.stat(pointer["blob"])
+        if stat is None:
+            return None
+        return StoredResult(
+            digest=pointer["blob"],
+            format=pointer["format"],
+            path=self.blobs.path(pointer["blob"]),
+            stat=stat,
+        )
+
+    async def read(self, result: StoredResult) -> bytes | None:
+        """Содержимое изображения; None, если файл удалили после получения указателя"""
+        return await asyncio.to_thread(self.blobs.read, result.digest)
+
+    async def load(self, key: str) -> bytes | None:
+        result = await self.get(key)
+        return await self.read(result) if result is not None else None
+
+    async def exists(self, key: str) -> bool:
+        return await self.get(key) is not None
+
+    async def get_ttl(self, key: str) -> int:
+        """Оставшееся время жизни указателя (см. AsyncRedisCache.get_ttl)"""
+        return await self.cache.get_ttl(key)
+
+
+result_store = ResultStore(
+    cache,
+    BlobStore(
+        BLOB_STORE_DIR,
+        max_bytes=BLOB_STORE_MAX_BYTES,
+        max_age=BLOB_STORE_MAX_AGE,
+        evict_interval=BLOB_STORE_EVICT_INTERVAL,
+    ),
+)
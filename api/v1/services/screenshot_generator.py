@@ -1,19 +1,217 @@
+import asyncio
 import base64
+import hashlib
+import json
+import math
 import os
 import random
-from io import BytesIO
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
 
-from PIL import Image
-from jinja2 import Environment, FileSystemLoader
-from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from playwright.async_api import (
+    async_playwright,
+    Browser,
+    Playwright,
+    Error as PlaywrightError,
+    TimeoutError as PlaywrightTimeoutError,
+)
 
-from core.caching.in_redis import cache
+from api.v1.services.logos import LOGO_PREFIX, load_logo
+from api.v1.services.results import RESULT_TTL, result_key, result_store
+from config import (
+    PAGE_POOL_SIZE,
+    RENDER_MODE,
+    OUTPUT_FORMAT,
+    JPEG_QUALITY,
+    TEMPLATE_AUTO_RELOAD,
+    TEMPLATE_BYTECODE_DIR,
+    BROWSER_RECYCLE_RENDERS,
+    BROWSER_RECYCLE_RSS_MB,
+    BROWSER_CHECK_INTERVAL,
+    BROWSER_DRAIN_TIMEOUT,
+    RESULT_SIZES,
+    COMPOSITE_LAYERS,
+    REQUIRE_FONTS,
+)
+from core.browser.assets import ASSET_HOST, AssetStore
+from core.browser.fonts import require_font
+from core.browser.page_pool import PagePool, PoolClosedError
+from core.imaging.encoder import composite_image, decode_layer, image_encoder
+from core.metrics.latency import LatencyStats
+from core.metrics.process import tree_rss_bytes
+from core.metrics.render import SCREENSHOT_STAGE_SECONDS, RENDER_SECONDS, BROWSER_RSS_BYTES, BROWSER_RECYCLES
 
 BASE_DIR = Path(__file__).parent.parent.parent.parent
 TEMPLATES_DIR = BASE_DIR / "templates"
+ASSETS_DIR = BASE_DIR / "assets"
 
-env = Environment(loader=FileSystemLoader(str(TEMPLATES_DIR)))
+SCREENSHOT_VIEWPORT = {"width": 472, "height": 672}
+
+# Шрифт шаблонов и страница, на которой при запуске проверяется, что Chromium его нашел
+REQUIRED_FONT = "Inter"
+_FONT_CHECK_HTML = (
+    f'<link rel="stylesheet" href="{ASSET_HOST}fonts/inter.css">'
+    f'<p style="font-family: {REQUIRED_FONT}">{REQUIRED_FONT}</p>'
+)
+
+# Сообщения Playwright об упавшей или закрытой под нагрузкой странице/браузере
+_CRASH_MARKERS = ("Target crashed", "Page crashed", "Target closed", "has been closed")
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """
+    Ошибка рендера — признак перегрузки (таймаут или упавший Chromium), а не плохих входных данных
+    """
+    if isinstance(error, (PlaywrightTimeoutError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, PlaywrightError) and any(marker in error.message for marker in _CRASH_MARKERS)
+
+
+@dataclass(frozen=True)
+class RenderSpec:
+    """
+    Как снимать шаблон: размер viewport, плотность пикселей и область кадра
+
+    Если задан clip (прямоугольник в CSS px) или selector (элемент), Chromium
+    растеризует и кодирует только эту область, а не весь viewport.
+    """
+    viewport: tuple[int, int]
+    device_scale_factor: float = 2
+    clip: tuple[int, int, int, int] | None = None
+    selector: str | None = None
+
+
+DEFAULT_RENDER_SPEC = RenderSpec(viewport=(SCREENSHOT_VIEWPORT["width"], SCREENSHOT_VIEWPORT["height"]))
+
+RENDER_SPECS: dict[str, RenderSpec] = {
+    # Содержимое — .screenshot-container 393x672 в левом верхнем углу
+    "phantom_wallet.html": RenderSpec(viewport=(393, 672), device_scale_factor=2, clip=(0, 0, 393, 672)),
+}
+
+
+def render_spec(template_name: str) -> RenderSpec:
+    return RENDER_SPECS.get(template_name, DEFAULT_RENDER_SPEC)
+
+
+def _scale_factors() -> list[float]:
+    """Плотности пикселей всех шаблонов: на каждую — свой контекст и пул страниц"""
+    return sorted({DEFAULT_RENDER_SPEC.device_scale_factor} | {
+        spec.device_scale_factor for spec in RENDER_SPECS.values()
+    })
+
+# Имена процессов Chromium среди потомков текущего процесса
+CHROMIUM_PROCESS_NAMES = ("chrom", "headless_shell")
+
+# Режимы рендера: "content" — Jinja + set_content на каждый рендер,
+# "hot" — шаблон загружен в странице пула, контекст подставляет window.__applyContext,
+# "composite" — как hot, но снимаются только динамические области ([data-bind])
+# и накладываются на закэшированный статичный слой
+CONTENT_MODE = "content"
+HOT_MODE = "hot"
+COMPOSITE_MODE = "composite"
+
+_APPLY_CONTEXT_JS = """async (ctx) => {
+    if (typeof window.__applyContext !== "function") return false;
+    await window.__applyContext(ctx);
+    return true;
+}"""
+
+# Раскладка для режима composite: прямоугольники динамических элементов и
+# подпись раскладки статичных. Статичный слой годится, пока подпись та же —
+# иначе динамический текст сдвинул или растянул что-то вокруг себя.
+# Элементы с backdrop-filter/filter размывают соседние пиксели, поэтому рядом
+# с динамическими областями они переснимаются целиком.
+_COMPOSE_LAYOUT_JS = """(margin) => {
+    const dynamic = [...document.querySelectorAll('[data-bind]')];
+    const box = (el) => { const r = el.getBoundingClientRect(); return [r.x, r.y, r.width, r.height]; };
+    if (!window.__composeLayout) {
+        const painted = (s) => s.backgroundColor !== 'rgba(0, 0, 0, 0)' || s.backgroundImage !== 'none'
+            || s.boxShadow !== 'none'
+            || ['Top', 'Right', 'Bottom', 'Left'].some((side) => parseFloat(s[`border${side}Width`]) > 0);
+        const all = [...document.body.querySelectorAll('*')].filter((el) => !el.closest('[data-bind]'));
+        window.__composeLayout = {
+            // Контейнеры динамических элементов важны, только если рисуют что-то сами
+            fixed: all.filter((el) => !dynamic.some((d) => el.contains(d)) || painted(getComputedStyle(el))),
+            effects: all.filter((el) => {
+                const s = getComputedStyle(el);
+                return s.backdropFilter !== 'none' || s.filter !== 'none';
+            }),
+        };
+    }
+    const {fixed, effects} = window.__composeLayout;
+    const regions = dynamic.filter((el) => el.getClientRects().length).map(box);
+    const near = ([x, y, w, h], [ex, ey, ew, eh]) =>
+        x < ex + ew + margin && ex < x + w + margin && y < ey + eh + margin && ey < y + h + margin;
+    for (const el of effects) {
+        const rect = box(el);
+        if (regions.some((r) => near(r, rect))) regions.push(rect);
+    }
+    return {layout: fixed.map((el) => box(el).join(',')).join(';'), regions};
+}"""
+
+# Статичный слой: динамические элементы скрыты без изменения раскладки
+_COMPOSE_BASE_JS = """(hide) => {
+    if (!document.getElementById('__compose-base')) {
+        const style = document.createElement('style');
+        style.id = '__compose-base';
+        style.textContent = 'html[data-compose-base] [data-bind] { visibility: hidden !important; }';
+        document.head.appendChild(style);
+    }
+    document.documentElement.toggleAttribute('data-compose-base', hide);
+}"""
+
+# Поля вокруг динамических областей (выносные элементы глифов, сглаживание), зазор,
+# при котором соседние области снимаются одной полосой, и радиус влияния размытия — CSS px
+COMPOSITE_REGION_PAD = 2
+COMPOSITE_BAND_GAP = 8
+COMPOSITE_EFFECT_MARGIN = 64
+
+
+def _region_bands(
+        regions: list[list[float]],
+        clip: tuple[int, int, int, int],
+        pad: int = COMPOSITE_REGION_PAD,
+        gap: int = COMPOSITE_BAND_GAP,
+) -> list[tuple[int, int, int, int]]:
+    """
+    Динамические области, объединенные в горизонтальные полосы
+
+    Снимок полосы — один вызов Chromium вместо нескольких мелких; статичные
+    пиксели внутри полосы совпадают со слоем, поэтому лишняя площадь безопасна.
+    Координаты целые в CSS px, чтобы полосы ложились на слой без сдвига.
+    """
+    cx, cy, cw, ch = clip
+    boxes = []
+    for x, y, width, height in regions:
+        x0, y0 = max(math.floor(x - pad), cx), max(math.floor(y - pad), cy)
+        x1, y1 = min(math.ceil(x + width + pad), cx + cw), min(math.ceil(y + height + pad), cy + ch)
+        if x0 < x1 and y0 < y1:
+            boxes.append([x0, y0, x1, y1])
+
+    bands: list[list[int]] = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        if bands and box[1] <= bands[-1][3] + gap:
+            band = bands[-1]
+            band[0], band[2], band[3] = min(band[0], box[0]), max(band[2], box[2]), max(band[3], box[3])
+        else:
+            bands.append(box)
+    return [(x0, y0, x1 - x0, y1 - y0) for x0, y0, x1, y1 in bands]
+
+
+def _clip(rect: tuple[int, int, int, int]) -> dict:
+    return dict(zip(("x", "y", "width", "height"), rect))
+
+
+# Без auto_reload get_template не проверяет mtime файла на каждый вызов;
+# байткод на диске избавляет следующие запуски от компиляции шаблонов
+env = Environment(
+    loader=FileSystemLoader(str(TEMPLATES_DIR)),
+    auto_reload=TEMPLATE_AUTO_RELOAD,
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_BYTECODE_DIR),
+)
 
 
 def image_to_data_uri(path: str) -> str:
@@ -27,15 +225,142 @@ def render_html(ctx: dict, template_name: str) -> str:
     return env.get_template(template_name).render(**ctx)
 
 
+_template_digests: dict[str, tuple[object, str]] = {}
+
+
+def template_digest(template_name: str) -> str:
+    """Хэш исходника шаблона; пересчитывается, когда Jinja перезагружает шаблон"""
+    template = env.get_template(template_name)
+    cached = _template_digests.get(template_name)
+    if cached is None or cached[0] is not template:
+        digest = hashlib.sha256(Path(template.filename).read_bytes()).hexdigest()
+        cached = _template_digests[template_name] = (template, digest)
+    return cached[1]
+
+
+def precompile_templates() -> list[str]:
+    """Скомпилировать все HTML-шаблоны и посчитать их хэши до первого запроса"""
+    names = env.list_templates(extensions=["html"])
+    for name in names:
+        template_digest(name)
+    return names
+
+
+def content_key(ctx: dict, template_name: str, output_format: str) -> str:
+    """
+    Ключ рендера по содержимому: шаблон (имя и версия), нормализованный контекст и формат
+
+    Одинаковые входные данные всегда дают один ключ, поэтому рендер можно
+    кэшировать и объединять одновременные запросы.
+    """
+    normalized = json.dumps(ctx, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    payload = "\n".join((template_name, template_digest(template_name), output_format, normalized))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
 class ScreenshotService:
-    def __init__(self):
+    """
+    Рендер шаблонов в Chromium с пулом страниц и управлением жизненным циклом браузера
+
+    Контекст браузера пересоздается после recycle_renders рендеров или когда
+    RSS Chromium превышает recycle_rss_mb (если и новый контекст не помог —
+    перезапускается браузер). Замена blue/green: новые рендеры сразу идут
+    в новый пул, а старый закрывается, когда начатые на нем рендеры завершатся.
+    Упавший или отключившийся браузер перезапускается автоматически.
+    """
+
+    def __init__(
+            self,
+            pool_size: int = PAGE_POOL_SIZE,
+            mode: str = RENDER_MODE,
+            recycle_renders: int = BROWSER_RECYCLE_RENDERS,
+            recycle_rss_mb: int = BROWSER_RECYCLE_RSS_MB,
+            check_interval: float = BROWSER_CHECK_INTERVAL,
+    ):
+        """
+        Args:
+            pool_size: Количество страниц в пуле
+            mode: Режим рендера, HOT_MODE, CONTENT_MODE или COMPOSITE_MODE
+            recycle_renders: Пересоздать контекст после стольких рендеров, 0 — никогда
+            recycle_rss_mb: Пересоздать контекст, когда RSS Chromium больше порога в МБ, 0 — никогда
+            check_interval: Период проверки памяти и соединения с браузером в секундах
+        """
         self._playwright: Playwright | None = None
         self._browser: Browser | None = None
-        self._context: BrowserContext | None = None
+        self.pool_size = pool_size
+        self._pool_wait_stats = LatencyStats()
+        # Пул страниц (каждый на своем контексте) по device_scale_factor
+        self._pools: dict[float, PagePool] = {}
+        self._assets = AssetStore(ASSETS_DIR)
+        self._assets.add_loader(LOGO_PREFIX, load_logo)
+        self.render_stats = LatencyStats()
+        self.mode = mode
+        self.recycle_renders = recycle_renders
+        self.recycle_rss_mb = recycle_rss_mb
+        self.check_interval = check_interval
+        # Шаблоны без window.__applyContext всегда рендерятся через set_content
+        self._content_only: set[str] = set()
+        # Статичные слои режима composite по шаблону, плотности, области кадра и подписи раскладки
+        self._layers: OrderedDict[tuple, object] = OrderedDict()
+        self.composite_layers = COMPOSITE_LAYERS
+        self.layer_hits = 0
+        self.layer_misses = 0
+        # Выполняемые рендеры по ключу кэша: одинаковые запросы ждут один рендер
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.renders = 0
+        self.context_recycles = 0
+        self.browser_restarts = 0
+        self._browser_started_at: float | None = None
+        # Последняя замена контекста была из-за памяти: при повторе перезапускаем браузер
+        self._recycled_for_memory = False
+        self._lifecycle_task: asyncio.Task | None = None
+        self._monitor_task: asyncio.Task | None = None
+        self._retiring: set[asyncio.Task] = set()
+        self._stopping = False
 
     async def start(self):
+        self._assets.load()
+        self._stopping = False
         self._playwright = await async_playwright().start()
-        self._browser = await self._playwright.chromium.launch(
+        self._browser, self._pools = await self._launch()
+        if REQUIRE_FONTS:
+            try:
+                await self._check_fonts()
+            except Exception:
+                await self.stop()
+                raise
+        self._monitor_task = asyncio.create_task(self._monitor())
+        BROWSER_RSS_BYTES.set_function(self.browser_rss_bytes)
+
+    async def _check_fonts(self):
+        """
+        Raises:
+            FontMissingError: Inter не установлен в системе — рендер шел бы fallback-шрифтом
+        """
+        async with next(iter(self._pools.values())).page() as page:
+            await page.set_content(_FONT_CHECK_HTML, wait_until="load")
+            await require_font(page, REQUIRED_FONT)
+
+    async def stop(self):
+        self._stopping = True
+        for task in (self._monitor_task, self._lifecycle_task, *self._retiring):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        image_encoder.close()
+        for pool in self._pools.values():
+            await pool.close()
+            await pool.context.close()
+        if self._browser:
+            await self._browser.close()
+        if self._playwright:
+            await self._playwright.stop()
+
+    async def _launch(self) -> tuple[Browser, dict[float, PagePool]]:
+        browser = await self._playwright.chromium.launch(
             headless=True,
             executable_path=os.getenv("CHROMIUM_PATH", None),  # alpine: /usr/bin/chromium-browser
             args=[
@@ -46,45 +371,338 @@ class ScreenshotService:
                 "--no-zygote",
             ],
         )
-        self._context = await self._browser.new_context(
-            viewport={"width": 393, "height": 852},
-            device_scale_factor=2,
-        )
+        browser.on("disconnected", self._on_disconnected)
+        self._browser_started_at = time.monotonic()
+        return browser, await self._new_pools(browser)
 
-    async def stop(self):
-        if self._context:
-            await self._context.close()
-        if self._browser:
-            await self._browser.close()
-        if self._playwright:
-            await self._playwright.stop()
+    async def _new_pools(self, browser: Browser) -> dict[float, PagePool]:
+        pools = {}
+        for scale in _scale_factors():
+            context = await browser.new_context(
+                viewport={"width": 393, "height": 852},
+                device_scale_factor=scale,
+            )
+            # Страница не ходит в сеть: шрифты и картинки — из памяти, остальное блокируется
+            await self._assets.attach(context)
+            pool = PagePool(self.pool_size, SCREENSHOT_VIEWPORT, self._pool_wait_stats)
+            await pool.start(context)
+            pools[scale] = pool
+        return pools
+
+    async def recycle_context(self, reason: str):
+        """Blue/green замена контекстов: новые рендеры идут в новые пулы, старые закрываются после начатых"""
+        pools = await self._new_pools(self._browser)
+        old_pools, self._pools = self._pools, pools
+        self.context_recycles += 1
+        BROWSER_RECYCLES.inc(kind="context", reason=reason)
+        print(f"Контекст Chromium пересоздан ({reason}) после {sum(p.acquired for p in old_pools.values())} рендеров")
+        await self._retire(old_pools)
+
+    async def restart_browser(self, reason: str):
+        """Запустить новый браузер, переключить на него рендеры и закрыть старый"""
+        old_browser, old_pools = self._browser, self._pools
+        self._browser, self._pools = await self._launch()
+        self.browser_restarts += 1
+        BROWSER_RECYCLES.inc(kind="browser", reason=reason)
+        print(f"Chromium перезапущен ({reason})")
+        await self._retire(old_pools, old_browser)
+
+    async def _retire(self, pools: dict[float, PagePool], browser: Browser | None = None):
+        for pool in pools.values():
+            await pool.retire()
+
+        async def _close():
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(pool.drain() for pool in pools.values())), BROWSER_DRAIN_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                print(f"Рендеры на старом контексте не завершились за {BROWSER_DRAIN_TIMEOUT} с, закрываем")
+            for closable in (*(pool.context for pool in pools.values()), browser):
+                if closable is None:
+                    continue
+                try:
+                    await closable.close()
+                except PlaywrightError:
+                    pass
+
+        task = asyncio.create_task(_close())
+        self._retiring.add(task)
+        task.add_done_callback(self._retiring.discard)
+
+    def _schedule(self, action, reason: str):
+        """Запустить замену контекста или браузера, если другая уже не выполняется"""
+        if self._stopping or (self._lifecycle_task is not None and not self._lifecycle_task.done()):
+            return
+        self._lifecycle_task = asyncio.create_task(action(reason))
+        self._lifecycle_task.add_done_callback(self._lifecycle_done)
+
+    @staticmethod
+    def _lifecycle_done(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Ошибка замены браузера: {task.exception()}")
+
+    def _on_disconnected(self, browser: Browser):
+        if browser is self._browser:
+            self._schedule(self.restart_browser, "disconnected")
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            if not self._browser.is_connected():
+                self._schedule(self.restart_browser, "disconnected")
+                continue
+            if self.recycle_rss_mb and self.browser_rss_bytes() > self.recycle_rss_mb * 2 ** 20:
+                if self._recycled_for_memory:
+                    self._schedule(self.restart_browser, "rss")
+                else:
+                    self._recycled_for_memory = True
+                    self._schedule(self.recycle_context, "rss")
+            else:
+                self._recycled_for_memory = False
+
+    def _count_render(self, pool: PagePool):
+        self.renders += 1
+        if not self.recycle_renders or pool not in self._pools.values():
+            return
+        if sum(p.acquired for p in self._pools.values()) >= self.recycle_renders:
+            self._schedule(self.recycle_context, "renders")
+
+    @staticmethod
+    def browser_rss_bytes() -> int:
+        """RSS процессов Chromium, запущенных этим процессом"""
+        return tree_rss_bytes(os.getpid(), CHROMIUM_PROCESS_NAMES)
+
+    async def warmup(self, contexts: dict[str, dict]):
+        """
+        Прогревочный рендер мимо кэша: по одному на каждую страницу пула
+
+        Chromium выполняет первую отрисовку и загружает шрифты, а в hot-режиме
+        шаблон остается загруженным на всех страницах.
 
-    async def render_screenshot(self, ctx: dict, template_name: str, task_id: str) -> bytes:
+        Args:
+            contexts: Контекст прогревочного рендера по имени шаблона
+        """
+        for template_name, ctx in contexts.items():
+            await asyncio.gather(*(self.capture(ctx, template_name) for _ in range(self.pool_size)))
+
+    async def render_screenshot(
+            self,
+            ctx: dict,
+            template_name: str,
+            task_id: str,
+            output_format: str = OUTPUT_FORMAT,
+            sizes: list[str] | None = None,
+            store: bool = True,
+    ) -> bytes:
+        """
+        Рендер с кэшем и объединением одинаковых запросов
+
+        Args:
+            sizes: Уменьшенные копии из RESULT_SIZES, которые сохраняются вместе с результатом
+            store: Сохранить результат в хранилище (офлайн-рендер забирает только байты)
+        """
         # Проверяем кэш
-        cache_key = f"{task_id}"
-        cached = await cache.get(cache_key, raw=True)
+        cache_key = result_key(task_id)
+        cached = await result_store.load(cache_key)
         if cached:
             return cached
 
+        task = self._inflight.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(ctx, template_name, cache_key, output_format, sizes or [], store))
+            self._inflight[cache_key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+        # shield: отмена одного ожидающего не отменяет общий рендер
+        return await asyncio.shield(task)
+
+    async def _render(
+            self,
+            ctx: dict,
+            template_name: str,
+            cache_key: str,
+            output_format: str,
+            sizes: list[str],
+            store: bool,
+    ) -> bytes:
         # Генерируем
-        html = render_html(ctx, template_name)
-        page = await self._context.new_page()
-        try:
-            await page.set_viewport_size({"width": 472, "height": 672})
-            await page.set_content(html, wait_until="domcontentloaded")
-            png_bytes = await page.screenshot(full_page=False)
-        finally:
-            await page.close()
-
-        img = Image.open(BytesIO(png_bytes)).convert("RGB")
-        buf = BytesIO()
-        img.save(buf, "JPEG", quality=95)
-        jpeg = buf.getvalue()
-
-        # Сохраняем в кэш — 1 час
-        await cache.set(cache_key, jpeg, ttl=3600, raw=True)
-
-        return jpeg
+        with self.render_stats.time(), RENDER_SECONDS.time(format=output_format):
+            # JPEG Chromium кодирует сам; остальные форматы — из PNG в пуле процессов
+            if output_format == "jpeg":
+                source = image = await self.capture(ctx, template_name, image_type="jpeg")
+            else:
+                source = await self.capture(ctx, template_name)
+                with SCREENSHOT_STAGE_SECONDS.time(stage="encode"):
+                    image = await image_encoder.encode(source, output_format)
+
+            # Уменьшенные копии — из того же снимка, без повторного рендера
+            with SCREENSHOT_STAGE_SECONDS.time(stage="resize"):
+                resized = await asyncio.gather(*(
+                    image_encoder.resize(source, RESULT_SIZES[size], output_format) for size in sizes
+                ))
+
+        if not store:
+            return image
+
+        # Файлы — в хранилище, указатели на них — в Redis на 1 час одной транзакцией
+        with SCREENSHOT_STAGE_SECONDS.time(stage="cache_write"):
+            items = {cache_key: image}
+            items.update((result_key(cache_key, size), data) for size, data in zip(sizes, resized))
+            await result_store.put_many(items, ttl=RESULT_TTL)
+
+        return image
+
+    async def capture(
+            self,
+            ctx: dict,
+            template_name: str,
+            mode: str | None = None,
+            image_type: str = "png",
+    ) -> bytes:
+        """
+        Отрисовать шаблон на странице из пула и вернуть PNG (или JPEG с JPEG_QUALITY)
+
+        Размер viewport, плотность пикселей и область кадра берутся из render_spec().
+        """
+        spec = render_spec(template_name)
+        viewport = {"width": spec.viewport[0], "height": spec.viewport[1]}
+        options = {"type": image_type}
+        if image_type == "jpeg":
+            options["quality"] = JPEG_QUALITY
+        if spec.clip is not None:
+            options["clip"] = _clip(spec.clip)
+        mode = mode or self.mode
+        hot = mode in (HOT_MODE, COMPOSITE_MODE) and template_name not in self._content_only
+        composite = mode == COMPOSITE_MODE and spec.selector is None
+        while True:
+            pool = self._pools[spec.device_scale_factor]
+            try:
+                async with pool.page(reset=not hot) as page:
+                    if page.viewport_size != viewport:
+                        await page.set_viewport_size(viewport)
+                    if not hot or not await self._apply_hot(pool, page, ctx, template_name):
+                        await self._set_content(pool, page, ctx, template_name)
+                    image = await self._capture_composite(page, template_name, spec, image_type) if composite else None
+                    if image is None:
+                        with SCREENSHOT_STAGE_SECONDS.time(stage="screenshot"):
+                            if spec.selector is not None:
+                                image = await page.locator(spec.selector).screenshot(**options)
+                            else:
+                                image = await page.screenshot(full_page=False, **options)
+            except PoolClosedError:
+                # Пул заменили, пока ждали страницу — берем из нового
+                continue
+            self._count_render(pool)
+            return image
+
+    async def _capture_composite(self, page, template_name: str, spec: RenderSpec, image_type: str) -> bytes | None:
+        """
+        Кадр из статичного слоя и заново снятых динамических областей
+
+        Слой снимается один раз на шаблон (версию) и раскладку; дальше каждый
+        рендер растеризует и передает из Chromium только полосы с [data-bind].
+
+        Returns:
+            None, если у шаблона нет динамических областей — нужен обычный снимок
+        """
+        clip = spec.clip or (0, 0, *spec.viewport)
+        with SCREENSHOT_STAGE_SECONDS.time(stage="layout"):
+            layout = await page.evaluate(_COMPOSE_LAYOUT_JS, COMPOSITE_EFFECT_MARGIN)
+        if not layout["regions"]:
+            return None
+
+        signature = hashlib.sha256(layout["layout"].encode()).hexdigest()
+        key = (template_name, template_digest(template_name), spec.device_scale_factor, clip, signature)
+        base = self._layers.get(key)
+        if base is None:
+            self.layer_misses += 1
+            base = await self._capture_layer(page, clip)
+            self._layers[key] = base
+            while len(self._layers) > self.composite_layers:
+                self._layers.popitem(last=False)
+        else:
+            self.layer_hits += 1
+            self._layers.move_to_end(key)
+
+        scale = spec.device_scale_factor
+        patches = []
+        with SCREENSHOT_STAGE_SECONDS.time(stage="screenshot"):
+            for band in _region_bands(layout["regions"], clip):
+                data = await page.screenshot(type="png", clip=_clip(band))
+                patches.append((round((band[0] - clip[0]) * scale), round((band[1] - clip[1]) * scale), data))
+        with SCREENSHOT_STAGE_SECONDS.time(stage="composite"):
+            return await asyncio.to_thread(composite_image, base, patches, image_type)
+
+    @staticmethod
+    async def _capture_layer(page, clip: tuple[int, int, int, int]):
+        """Снимок страницы со скрытыми динамическими элементами, декодированный для наложения"""
+        with SCREENSHOT_STAGE_SECONDS.time(stage="base_layer"):
+            await page.evaluate(_COMPOSE_BASE_JS, True)
+            try:
+                data = await page.screenshot(type="png", clip=_clip(clip))
+            finally:
+                await page.evaluate(_COMPOSE_BASE_JS, False)
+            return await asyncio.to_thread(decode_layer, data)
+
+    async def _apply_hot(self, pool: PagePool, page, ctx: dict, template_name: str) -> bool:
+        template = env.get_template(template_name)
+        # Шаблон перезагружен Jinja (или страница новая) — загружаем его заново
+        if pool.state.get(page) is not template:
+            with SCREENSHOT_STAGE_SECONDS.time(stage="jinja"):
+                html = template.render(**ctx)
+            with SCREENSHOT_STAGE_SECONDS.time(stage="set_content"):
+                await page.set_content(html, wait_until="load")
+            pool.state[page] = template
+
+        with SCREENSHOT_STAGE_SECONDS.time(stage="apply_context"):
+            applied = await page.evaluate(_APPLY_CONTEXT_JS, ctx)
+        if applied:
+            return True
+
+        self._content_only.add(template_name)
+        return False
+
+    async def _set_content(self, pool: PagePool, page, ctx: dict, template_name: str):
+        pool.state.pop(page, None)
+        with SCREENSHOT_STAGE_SECONDS.time(stage="jinja"):
+            html = render_html(ctx, template_name)
+        with SCREENSHOT_STAGE_SECONDS.time(stage="set_content"):
+            await page.set_content(html, wait_until="load")
+            await page.evaluate("() => document.fonts.ready.then(() => true)")
+
+    @property
+    def inflight(self) -> int:
+        """Рендеры, выполняемые сейчас (одинаковые запросы считаются один раз)"""
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        """Латентность рендера и ожидания страницы из пула"""
+        return {
+            "render": self.render_stats.snapshot(),
+            "pool_wait": self._pool_wait_stats.snapshot(),
+            "pool_size": self.pool_size * len(self._pools),
+            "pool_idle": sum(pool.idle for pool in self._pools.values()),
+            "mode": self.mode,
+            "composite_layers": {"cached": len(self._layers), "hits": self.layer_hits, "misses": self.layer_misses},
+            "assets": self._assets.stats(),
+            "browser": self.browser_stats(),
+        }
+
+    def browser_stats(self) -> dict:
+        """Возраст браузера и контекста, число рендеров, замен и память Chromium"""
+        now = time.monotonic()
+        started = [pool.started_at for pool in self._pools.values() if pool.started_at is not None]
+        return {
+            "connected": bool(self._browser and self._browser.is_connected()),
+            "age_s": round(now - self._browser_started_at, 1) if self._browser_started_at else None,
+            "context_age_s": round(now - min(started), 1) if started else None,
+            "renders": self.renders,
+            "context_renders": sum(pool.acquired for pool in self._pools.values()),
+            "context_recycles": self.context_recycles,
+            "browser_restarts": self.browser_restarts,
+            "retiring_contexts": len(self._retiring),
+            "rss_mb": round(self.browser_rss_bytes() / 2 ** 20, 1),
+        }
 
 
 screenshot_service = ScreenshotService()
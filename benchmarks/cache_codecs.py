@@ -0,0 +1,77 @@
+"""
+Микро-бенчмарк кодеков кэша на наших данных: курс, контекст шаблона, JPEG
+
+Для каждого кодека печатает размер, время сжатия и распаковки, а также
+сколько стоит распаковка в event loop против перехода в пул потоков.
+Redis и Chromium не нужны.
+
+    python -m benchmarks.cache_codecs --jpeg screenshot.jpg --output codecs.json
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.report import write_report
+from benchmarks.samples import SAMPLE_CONTEXT, SAMPLE_PRICE, sample_screenshot
+from core.caching.codecs import CODECS, decode_value, encode_value
+
+
+def _per_call_us(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def _executor_decode_us(data: bytes, rounds: int) -> float:
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await loop.run_in_executor(None, decode_value, data)
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+async def run_codecs(rounds: int, jpeg: bytes | None = None) -> list[dict]:
+    payloads = {
+        "price": SAMPLE_PRICE,
+        "context": SAMPLE_CONTEXT,
+        "jpeg": jpeg or sample_screenshot("JPEG"),
+    }
+    results = []
+    for payload_name, payload in payloads.items():
+        # JPEG в сотни килобайт — меньше повторов
+        payload_rounds = rounds if payload_name != "jpeg" else max(rounds // 100, 5)
+        for codec in CODECS:
+            data = encode_value(payload, codec, min_size=0)
+            result = {
+                "name": f"codec.{payload_name}.{codec}",
+                "bytes": len(data),
+                "encode_us": round(_per_call_us(lambda: encode_value(payload, codec, min_size=0), payload_rounds), 1),
+                "decode_inline_us": round(_per_call_us(lambda: decode_value(data), payload_rounds), 1),
+                "decode_executor_us": round(await _executor_decode_us(data, payload_rounds), 1),
+            }
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jpeg", help="Настоящий скриншот вместо синтетической картинки")
+    parser.add_argument("--rounds", type=int, default=2000)
+    parser.add_argument("--output", help="Куда сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    jpeg = None
+    if args.jpeg:
+        with open(args.jpeg, "rb") as f:
+            jpeg = f.read()
+
+    results = await run_codecs(args.rounds, jpeg)
+    if args.output:
+        write_report(args.output, "cache_codecs", vars(args), results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
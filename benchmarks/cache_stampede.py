@@ -0,0 +1,112 @@
+"""
+Проверка защиты get_or_set от stampede: сколько раз выполняется factory
+при N одновременных промахах из нескольких экземпляров кэша (как из разных процессов)
+
+С блокировкой factory должна выполниться ровно один раз на все экземпляры,
+без нее — не больше одного раза на экземпляр; упавшая factory должна сразу
+отпускать блокировку. Код выхода 1, если что-то из этого нарушено.
+Требует доступный Redis из config.REDIS_URL.
+
+    python -m benchmarks.cache_stampede --callers 200 --instances 4
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+
+from config import REDIS_URL
+from core.caching.in_redis import AsyncRedisCache
+
+
+async def run(callers: int, instances: int, lock: bool, compute_seconds: float) -> dict:
+    caches = [AsyncRedisCache(REDIS_URL) for _ in range(instances)]
+    key = f"bench:stampede:{uuid.uuid4()}"
+    calls = 0
+
+    async def factory():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(compute_seconds)
+        return {"value": calls}
+
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(
+            caches[i % instances].get_or_set(key, factory, ttl=60, lock=lock)
+            for i in range(callers)
+        ))
+        elapsed = time.perf_counter() - started
+        await caches[0].delete(key)
+    finally:
+        for cache in caches:
+            await cache.close()
+
+    return {
+        "callers": callers,
+        "instances": instances,
+        "lock": lock,
+        "factory_calls": calls,
+        "distinct_results": len({json.dumps(result) for result in results}),
+        "seconds": round(elapsed, 3),
+    }
+
+
+async def run_failure(lock_wait: float) -> dict:
+    """Упавшая factory под блокировкой: следующий промах из другого экземпляра не ждет lock_wait"""
+    owner, other = AsyncRedisCache(REDIS_URL), AsyncRedisCache(REDIS_URL)
+    key = f"bench:stampede:{uuid.uuid4()}"
+
+    async def failing():
+        raise RuntimeError("factory failed")
+
+    async def factory():
+        return {"value": 1}
+
+    try:
+        try:
+            await owner.get_or_set(key, failing, ttl=60, lock=True)
+        except RuntimeError:
+            pass
+        started = time.perf_counter()
+        await other.get_or_set(key, factory, ttl=60, lock=True, lock_wait=lock_wait)
+        elapsed = time.perf_counter() - started
+        await owner.delete(key)
+    finally:
+        await owner.close()
+        await other.close()
+
+    return {"failure_recovery_seconds": round(elapsed, 3), "lock_wait": lock_wait}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=200)
+    parser.add_argument("--instances", type=int, default=4)
+    parser.add_argument("--compute-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Без блокировки factory выполняется один раз на экземпляр, с ней — один раз всего
+    failures = []
+    for lock in (False, True):
+        result = await run(args.callers, args.instances, lock, args.compute_seconds)
+        print(json.dumps(result), flush=True)
+        max_calls = 1 if lock else args.instances
+        if result["factory_calls"] > max_calls:
+            failures.append(f"lock={lock}: factory вызвана {result['factory_calls']} раз, ожидалось <= {max_calls}")
+        if lock and result["distinct_results"] != 1:
+            failures.append(f"lock=True: вызывающие получили {result['distinct_results']} разных значения")
+
+    result = await run_failure(lock_wait=2.0)
+    print(json.dumps(result), flush=True)
+    if result["failure_recovery_seconds"] >= result["lock_wait"]:
+        failures.append("упавшая factory не отпустила блокировку: следующий вызов ждал lock_wait")
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
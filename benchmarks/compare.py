@@ -0,0 +1,54 @@
+"""
+Сравнение двух отчетов бенчмарков (benchmarks.report) по одинаковым замерам
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+
+Код выхода 1, если какая-то метрика ухудшилась больше чем на threshold процентов.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Для времени, размера и памяти больше — хуже; для этих метрик — наоборот
+_HIGHER_IS_BETTER = ("throughput_rps",)
+
+
+def _lower_is_better(metric: str) -> bool:
+    return metric.endswith(("_ms", "_us")) or metric in ("bytes", "rss_peak_mb")
+
+
+def _load(path: str) -> dict[str, dict]:
+    report = json.loads(Path(path).read_text(encoding="utf-8"))
+    return {result["name"]: result for result in report["results"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Допустимое ухудшение, %%")
+    args = parser.parse_args()
+
+    before, after = _load(args.before), _load(args.after)
+    regressions = 0
+    for name in sorted(before.keys() & after.keys()):
+        for metric, old in before[name].items():
+            new = after[name].get(metric)
+            if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+                continue
+            if not _lower_is_better(metric) and metric not in _HIGHER_IS_BETTER:
+                continue
+            change = (new - old) / old * 100
+            worse = -change if metric in _HIGHER_IS_BETTER else change
+            mark = ""
+            if worse > args.threshold:
+                mark = "  <-- регрессия"
+                regressions += 1
+            print(f"{name:40} {metric:22} {old:>12} -> {new:>12} ({change:+.1f}%){mark}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
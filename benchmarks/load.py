@@ -0,0 +1,147 @@
+"""
+Нагрузочный бенчмарк всего сервиса: POST /phantom + GET /result с заданной частотой
+
+Поднимает приложение из main.register_app() через uvicorn в этом процессе,
+CoinGecko заменяется локальной заглушкой, Redis — локальный из config.REDIS_URL
+или in-process fakeredis (--fake-redis). Рендер выполняется встроенным
+потребителем очереди (EMBEDDED_WORKER), поэтому нужен Chromium.
+
+Для каждой частоты запросов открытым циклом (новые запросы не ждут старых)
+записывает пропускную способность, латентность POST, время до результата и RSS.
+
+    python -m benchmarks.load --rates 5,10,20 --duration 30 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.report import write_report
+from benchmarks.samples import SAMPLE_REQUEST
+from benchmarks.stubs import CoinGeckoStub, use_fake_redis
+from core.metrics.latency import LatencyStats
+from core.metrics.process import tree_rss_bytes
+
+API = "/api/v1/screenshots"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _sample_rss(samples: list[dict], started: float, interval: float = 0.5):
+    while True:
+        samples.append({"t": round(time.perf_counter() - started, 2), "rss_mb": round(tree_rss_bytes(os.getpid()) / 2 ** 20, 1)})
+        await asyncio.sleep(interval)
+
+
+async def run_rate(client: httpx.AsyncClient, rate: float, duration: float, unique_ratio: float) -> dict:
+    post_stats = LatencyStats(window=int(rate * duration) + 1)
+    result_stats = LatencyStats(window=int(rate * duration) + 1)
+    outcomes: Counter[str] = Counter()
+    rss: list[dict] = []
+
+    async def one():
+        # Часть запросов повторяет один и тот же контекст — это попадания в кэш рендера
+        seed = random.getrandbits(48) if random.random() < unique_ratio else 0
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{API}/phantom", json={**SAMPLE_REQUEST, "seed": seed})
+            post_stats.observe(time.perf_counter() - started)
+            if response.status_code != 200:
+                outcomes[f"post_{response.status_code}"] += 1
+                return
+            task_id = response.json()["task_id"]
+            response = await client.get(f"{API}/result", params={"task_id": task_id, "wait": 30})
+        except httpx.HTTPError as e:
+            outcomes[type(e).__name__] += 1
+            return
+        if response.status_code == 200 and response.content:
+            result_stats.observe(time.perf_counter() - started)
+            outcomes["ok"] += 1
+        else:
+            outcomes[f"result_{response.status_code}"] += 1
+
+    started = time.perf_counter()
+    sampler = asyncio.create_task(_sample_rss(rss, started))
+    requests = []
+    sent = 0
+    while time.perf_counter() - started < duration:
+        requests.append(asyncio.create_task(one()))
+        sent += 1
+        await asyncio.sleep(max(0.0, started + sent / rate - time.perf_counter()))
+    await asyncio.gather(*requests)
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+
+    return {
+        "name": f"load.rate_{rate:g}",
+        "rate": rate,
+        "sent": sent,
+        "seconds": round(elapsed, 2),
+        "throughput_rps": round(outcomes["ok"] / elapsed, 2),
+        "outcomes": dict(outcomes),
+        **{f"post_{k}": v for k, v in post_stats.snapshot().items() if k != "count"},
+        **{f"result_{k}": v for k, v in result_stats.snapshot().items() if k != "count"},
+        "rss_peak_mb": max((sample["rss_mb"] for sample in rss), default=None),
+        "rss": rss,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", default="5,10,20", help="Частоты запросов в секунду через запятую")
+    parser.add_argument("--duration", type=float, default=30, help="Секунд на каждую частоту")
+    parser.add_argument("--unique-ratio", type=float, default=1.0, help="Доля запросов с новым контекстом")
+    parser.add_argument("--coingecko-latency", type=float, default=0.05, help="Задержка заглушки CoinGecko, сек")
+    parser.add_argument("--fake-redis", action="store_true", help="fakeredis в процессе вместо Redis")
+    parser.add_argument("--output", help="Куда сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    stub = CoinGeckoStub(latency=args.coingecko_latency)
+    stub.start()
+    # config читается при импорте — окружение задаем до импорта приложения
+    os.environ["COINGECKO_BASE_URL"] = stub.url
+    os.environ.setdefault("EMBEDDED_WORKER", "1")
+
+    import uvicorn
+    from main import register_app
+
+    if args.fake_redis:
+        use_fake_redis()
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(register_app(), host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        if serving.done():
+            serving.result()
+        await asyncio.sleep(0.1)
+
+    results = []
+    try:
+        limits = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            for rate in (float(value) for value in args.rates.split(",")):
+                result = await run_rate(client, rate, args.duration, args.unique_ratio)
+                print(json.dumps({k: v for k, v in result.items() if k != "rss"}), flush=True)
+                results.append(result)
+    finally:
+        server.should_exit = True
+        await serving
+        stub.stop()
+
+    if args.output:
+        write_report(args.output, "load", {**vars(args), "coingecko_requests": stub.requests}, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Проверка пути логотипа: ingest_logo с настоящим PNG data URI и чтение обратно через load_logo
+
+Логотип должен сохраниться в кэше байтами (не JSON), вернуться загрузчиком
+AssetStore квадратом LOGO_SIZE в THUMBNAIL_FORMAT, а повторная загрузка
+того же логотипа — дать тот же URL. Код выхода 1, если что-то из этого
+нарушено. Требует доступный Redis из config.REDIS_URL и Pillow.
+
+    python -m benchmarks.logo_ingest
+"""
+import asyncio
+import base64
+import json
+import sys
+from io import BytesIO
+
+from PIL import Image
+
+from api.v1.services.logos import ingest_logo, load_logo
+from config import LOGO_SIZE
+from core.browser.assets import ASSET_HOST
+from core.caching.in_redis import cache
+from core.imaging.encoder import THUMBNAIL_FORMAT, image_encoder, probe_image
+
+
+def _png_data_uri() -> str:
+    buf = BytesIO()
+    Image.new("RGBA", (200, 120), (250, 120, 30, 255)).save(buf, "PNG")
+    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+
+
+async def main():
+    data_uri = _png_data_uri()
+    failures = []
+    try:
+        url = await ingest_logo(data_uri)
+        name = url.removeprefix(ASSET_HOST)
+        data = await load_logo(name)
+        again = await ingest_logo(data_uri)
+    finally:
+        image_encoder.close()
+        await cache.close()
+
+    if not isinstance(data, bytes):
+        failures.append(f"load_logo({name}) вернул {type(data).__name__}, ожидались bytes")
+    else:
+        image_format, size = probe_image(data)
+        print(json.dumps({"url": url, "bytes": len(data), "format": image_format, "size": size}), flush=True)
+        if image_format.lower() != THUMBNAIL_FORMAT or tuple(size) != (LOGO_SIZE, LOGO_SIZE):
+            failures.append(f"логотип {image_format} {size}, ожидался {THUMBNAIL_FORMAT} {LOGO_SIZE}x{LOGO_SIZE}")
+    if again != url:
+        failures.append(f"повторная загрузка дала другой URL: {again} != {url}")
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
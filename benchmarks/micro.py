@@ -0,0 +1,53 @@
+"""
+Микро-бенчмарки горячих мест без Chromium и Redis: Jinja-рендер шаблона,
+кодирование скриншота Pillow и кодеки кэша
+
+    python -m benchmarks.micro --output micro.json
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from api.v1.services.screenshot_generator import render_html
+from benchmarks.cache_codecs import run_codecs
+from benchmarks.report import write_report
+from benchmarks.samples import SAMPLE_CONTEXT, sample_screenshot
+from core.imaging.encoder import SUPPORTED_FORMATS, encode_image
+from core.metrics.latency import LatencyStats
+
+TEMPLATE = "phantom_wallet.html"
+
+
+def _measure(name: str, fn, rounds: int) -> dict:
+    fn()  # прогрев: компиляция шаблона, загрузка плагинов Pillow
+    stats = LatencyStats(window=rounds)
+    for _ in range(rounds):
+        with stats.time():
+            fn()
+    result = {"name": name, **stats.snapshot()}
+    print(json.dumps(result), flush=True)
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output", help="Куда сохранить отчет в JSON")
+    args = parser.parse_args()
+
+    results = [_measure("render_html", lambda: render_html(SAMPLE_CONTEXT, TEMPLATE), args.rounds * 10)]
+
+    # Тот же шаг, что в ScreenshotService._render: PNG из Chromium -> целевой формат
+    png = sample_screenshot("PNG")
+    for fmt in SUPPORTED_FORMATS:
+        results.append(_measure(f"encode.{fmt}", lambda: encode_image(png, fmt), args.rounds))
+
+    results.extend(await run_codecs(args.rounds * 10))
+
+    if args.output:
+        write_report(args.output, "micro", vars(args), results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
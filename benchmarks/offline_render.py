@@ -0,0 +1,78 @@
+"""
+Проверка рендера без сети: шаблон отрисовывается только из AssetStore
+
+Открывает phantom_wallet.html в контексте Chromium с offline=True и тем же
+перехватом запросов, что у ScreenshotService, и проверяет, что:
+  - каждый полученный страницей ответ отдан AssetStore из памяти
+    (ASSET_HOST или внешний URL из manifest.json), а не сетью;
+  - шрифт Inter действительно загружен (document.fonts.check и загруженные
+    начертания) и рисуется им, а не fallback-шрифтом (ширина текста).
+Код выхода 1, если что-то из этого нарушено. Требует Chromium, Redis не нужен.
+
+    python -m benchmarks.offline_render
+"""
+import asyncio
+import json
+import os
+import sys
+
+from playwright.async_api import async_playwright
+
+from api.v1.services.screenshot_generator import ASSETS_DIR, REQUIRED_FONT, render_html
+from benchmarks.samples import SAMPLE_CONTEXT
+from core.browser.assets import AssetStore
+from core.browser.fonts import probe_font
+
+TEMPLATE = "phantom_wallet.html"
+
+async def main():
+    assets = AssetStore(ASSETS_DIR)
+    assets.load()
+    responses: list[str] = []
+    failed: list[str] = []
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(
+            headless=True,
+            executable_path=os.getenv("CHROMIUM_PATH", None),
+            args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"],
+        )
+        try:
+            context = await browser.new_context(offline=True, device_scale_factor=2)
+            await assets.attach(context)
+            page = await context.new_page()
+            page.on("response", lambda response: responses.append(response.url))
+            page.on("requestfailed", lambda request: failed.append(request.url))
+            await page.set_content(render_html(SAMPLE_CONTEXT, TEMPLATE), wait_until="load")
+            fonts = await probe_font(page, REQUIRED_FONT)
+            await page.screenshot()
+        finally:
+            await browser.close()
+
+    # Все, что страница получила, должно разрешаться в ассет из памяти
+    from_network = [url for url in responses if assets.resolve(url) is None]
+    failures = []
+    if from_network:
+        failures.append(f"ответы не из AssetStore: {from_network}")
+    if not responses:
+        failures.append("страница не запросила ни одного ассета — @import шрифтов не перехвачен")
+    if not fonts["ok"]:
+        failures.append(
+            f"шрифт {REQUIRED_FONT} не загружен (check={fonts['check']}, loaded={fonts['loaded']},"
+            f" failed={fonts['failed']}, rendered={fonts['rendered']})"
+        )
+
+    print(json.dumps({
+        "served": responses,
+        "blocked": failed,
+        "inter_weights_loaded": fonts["loaded"],
+        "inter_weights_failed": fonts["failed"],
+        "asset_stats": assets.stats(),
+    }, ensure_ascii=False))
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
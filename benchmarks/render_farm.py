@@ -0,0 +1,59 @@
+"""
+Бенчмарк масштабирования RenderWorkerFarm: пропускная способность от 1 до N воркеров
+
+Требует Chromium и доступный Redis из config.REDIS_URL.
+
+    python -m benchmarks.render_farm --max-workers 16 --jobs 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from api.v1.services.render_farm import RenderWorkerFarm
+from benchmarks.samples import SAMPLE_CONTEXT
+
+
+async def run(workers: int, jobs: int) -> dict:
+    farm = RenderWorkerFarm(workers)
+    await farm.start()
+    try:
+        # Прогрев: первый рендер в каждом воркере платит за запуск страницы
+        await asyncio.gather(*(
+            farm.render_screenshot(SAMPLE_CONTEXT, "phantom_wallet.html", f"bench_{uuid.uuid4()}")
+            for _ in range(workers)
+        ))
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            farm.render_screenshot(SAMPLE_CONTEXT, "phantom_wallet.html", f"bench_{uuid.uuid4()}")
+            for _ in range(jobs)
+        ))
+        elapsed = time.perf_counter() - started
+    finally:
+        await farm.stop()
+
+    return {
+        "workers": workers,
+        "jobs": jobs,
+        "seconds": round(elapsed, 3),
+        "renders_per_second": round(jobs / elapsed, 2),
+        **{f"render_{k}": v for k, v in farm.render_stats.snapshot().items() if k != "count"},
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--jobs", type=int, default=200)
+    args = parser.parse_args()
+
+    # 1, 2, 4, ... и само значение max-workers
+    counts = sorted({2 ** i for i in range(args.max_workers.bit_length()) if 2 ** i <= args.max_workers} | {args.max_workers})
+    for workers in counts:
+        print(json.dumps(await run(workers, args.jobs)), flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
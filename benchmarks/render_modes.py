@@ -0,0 +1,108 @@
+"""
+Сравнение режимов рендера: hot-template и composite против Jinja + set_content
+
+Для набора контекстов снимает скриншот во всех режимах, проверяет, что hot
+совпадает с эталоном попиксельно, а composite (статичный слой + динамические
+области) — в пределах допуска, и печатает латентность. Требует Chromium,
+Redis не нужен.
+
+    python -m benchmarks.render_modes --rounds 50 --tolerance 0.0005
+"""
+import argparse
+import asyncio
+import base64
+import itertools
+import json
+import sys
+from io import BytesIO
+
+from PIL import Image, ImageChops
+
+from api.v1.services.screenshot_generator import ScreenshotService, CONTENT_MODE, HOT_MODE, COMPOSITE_MODE
+from benchmarks.samples import SAMPLE_CONTEXT
+from core.metrics.latency import LatencyStats
+
+TEMPLATE = "phantom_wallet.html"
+
+
+def _logo_data_uri() -> str:
+    buf = BytesIO()
+    Image.new("RGB", (64, 64), (250, 120, 30)).save(buf, "PNG")
+    return f"data:image/png;base64,{base64.b64encode(buf.getvalue()).decode()}"
+
+
+def contexts() -> list[dict]:
+    """Варианты контекста: знаки изменений, логотип, длинные строки"""
+    variants = []
+    logo = _logo_data_uri()
+    for sign, with_logo in itertools.product(("", "-"), (False, True)):
+        ctx = dict(SAMPLE_CONTEXT)
+        for key in ("usdt_amount_change", "solana_amount_change", "token_change", "total_diff", "total_diff_percent"):
+            ctx[key] = f"{sign}{ctx[key].lstrip('-')}"
+        ctx["token_logo"] = logo if with_logo else None
+        variants.append(ctx)
+    variants.append({**SAMPLE_CONTEXT, "token_name": "Очень длинное имя токена", "solana_amount_change": "-2.00"})
+    return variants
+
+
+def diff_pixels(a: bytes, b: bytes, threshold: int = 0) -> tuple[int, int]:
+    """Число пикселей, отличающихся больше чем на threshold по яркости разницы, и всего пикселей"""
+    img_a = Image.open(BytesIO(a)).convert("RGB")
+    img_b = Image.open(BytesIO(b)).convert("RGB")
+    total = img_a.width * img_a.height
+    if img_a.size != img_b.size:
+        return total, total
+    diff = ImageChops.difference(img_a, img_b).convert("L").point(lambda v: 255 if v > threshold else 0)
+    return diff.histogram()[255], total
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--tolerance", type=float, default=0.0005, help="Допустимая доля отличающихся пикселей composite")
+    parser.add_argument("--threshold", type=int, default=8, help="Разница яркости, с которой пиксель считается другим")
+    args = parser.parse_args()
+
+    service = ScreenshotService(pool_size=1)
+    await service.start()
+    mismatches = 0
+    worst_composite = 0.0
+    stats = {CONTENT_MODE: LatencyStats(), HOT_MODE: LatencyStats(), COMPOSITE_MODE: LatencyStats()}
+    try:
+        variants = contexts()
+        # Шаблон загружается с последним контекстом, дальше каждый hot-рендер — только подстановка
+        await service.capture(variants[-1], TEMPLATE, mode=HOT_MODE)
+        hot_shots = [await service.capture(ctx, TEMPLATE, mode=HOT_MODE) for ctx in variants]
+        composite_shots = [await service.capture(ctx, TEMPLATE, mode=COMPOSITE_MODE) for ctx in variants]
+        content_shots = [await service.capture(ctx, TEMPLATE, mode=CONTENT_MODE) for ctx in variants]
+        for ctx, hot, composite, content in zip(variants, hot_shots, composite_shots, content_shots):
+            differing, _ = diff_pixels(content, hot)
+            if differing:
+                mismatches += 1
+                print(f"Расхождение hot: {differing} px для контекста {ctx}", file=sys.stderr)
+            differing, total = diff_pixels(content, composite, args.threshold)
+            worst_composite = max(worst_composite, differing / total)
+            if differing / total > args.tolerance:
+                mismatches += 1
+                print(f"Расхождение composite: {differing} px из {total} для контекста {ctx}", file=sys.stderr)
+
+        # Режимы замеряются по очереди: set_content сбрасывает загруженный hot-шаблон;
+        # статичные слои composite к этому моменту уже сняты сравнением выше
+        for mode, mode_stats in stats.items():
+            for _, ctx in zip(range(args.rounds), itertools.cycle(contexts())):
+                with mode_stats.time():
+                    await service.capture(ctx, TEMPLATE, mode=mode)
+    finally:
+        await service.stop()
+
+    print(json.dumps({
+        "pixel_mismatches": mismatches,
+        "composite_max_diff_ratio": round(worst_composite, 6),
+        "composite_layers": service.stats()["composite_layers"],
+        **{mode: s.snapshot() for mode, s in stats.items()},
+    }))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
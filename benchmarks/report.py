@@ -0,0 +1,42 @@
+"""Отчеты бенчмарков в JSON для сравнения между версиями (см. benchmarks.compare)"""
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_report(path: str, suite: str, params: dict, results: list[dict]):
+    """
+    Сохранить результаты вместе с версией кода и окружением
+
+    Args:
+        path: Файл отчета
+        suite: Имя набора бенчмарков
+        params: Параметры запуска
+        results: Замеры; у каждого уникальное поле "name"
+    """
+    report = {
+        "suite": suite,
+        "revision": _git_revision(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    Path(path).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
@@ -0,0 +1,60 @@
+"""Типичные данные для бенчмарков"""
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+
+SAMPLE_CONTEXT = {
+    "domain": "solpulse.dev",
+    "name": "PEPE",
+    "amount": "150K",
+    "multiplier": "14.2",
+    "usdt_amount": "921.62",
+    "usdt_amount_change": "0.03",
+    "token_name": "Ethereum",
+    "token_ticker": "ETH",
+    "token_amount": "102.82",
+    "token_amount_usd": "0.00",
+    "token_change": "-0.41",
+    "token_logo": None,
+    "usd_price_per_token": 0.0000284,
+    "solana_amount": "7.51",
+    "solana_amount_usdt": "1412.30",
+    "solana_amount_change": "1.12",
+    "current_time": "12:00",
+    "total": "2333.92",
+    "total_diff": "0.74",
+    "total_diff_percent": "0.03",
+}
+
+# Запись курса в кэше в формате PriceProvider
+SAMPLE_PRICE = {
+    "value": {"symbol": "SOL", "vs_currency": "USD", "price": 187.42},
+    "fetched_at": 1760000000.0,
+}
+
+# Тело POST /phantom
+SAMPLE_REQUEST = {
+    "domain": "solpulse.dev",
+    "name": "PEPE",
+    "amount": "150K",
+    "multiplier": "14.2",
+    "usdt_amount": 921.62,
+    "token_name": "Ethereum",
+    "token_ticker": "ETH",
+    "token_amount": 102.82,
+    "usd_price_per_token": 0.0000284,
+}
+
+
+def sample_screenshot(fmt: str = "PNG") -> bytes:
+    """Картинка размером со скриншот (393x852 @2x) с текстом и плашками"""
+    img = Image.new("RGB", (786, 1704), (28, 28, 30))
+    draw = ImageDraw.Draw(img)
+    for i in range(12):
+        top = 200 + i * 120
+        draw.rounded_rectangle((32, top, 754, top + 100), radius=24, fill=(44, 44, 48))
+        draw.text((64, top + 36), f"{SAMPLE_CONTEXT['token_name']} {i} — ${SAMPLE_CONTEXT['total']}", fill=(240, 240, 240))
+    buf = BytesIO()
+    img.save(buf, fmt, **({"quality": 95} if fmt == "JPEG" else {}))
+    return buf.getvalue()
@@ -0,0 +1,78 @@
+"""Локальные заменители внешних сервисов для воспроизводимых бенчмарков"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class CoinGeckoStub:
+    """
+    HTTP-заглушка /simple/price CoinGecko в отдельном потоке
+
+    Отвечает фиксированной ценой на любой тикер с заданной задержкой.
+    """
+
+    def __init__(self, price: float = 187.42, latency: float = 0.0):
+        self.price = price
+        self.latency = latency
+        self.requests = 0
+        self._server: ThreadingHTTPServer | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                url = urlparse(self.path)
+                if not url.path.endswith("/simple/price"):
+                    self.send_error(404)
+                    return
+                params = parse_qs(url.query)
+                currency = params.get("vs_currencies", ["usd"])[0]
+                symbols = params.get("symbols", [""])[0].split(",")
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = json.dumps({symbol: {currency: stub.price} for symbol in symbols if symbol}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def use_fake_redis():
+    """
+    Подменить соединения с Redis на fakeredis в текущем процессе
+
+    Подходит только для EMBEDDED_WORKER без RENDER_WORKERS: процессы-воркеры
+    не видят in-process Redis.
+    """
+    try:
+        from fakeredis import FakeAsyncRedis
+    except ImportError:
+        raise SystemExit("Для --fake-redis нужен пакет fakeredis (pip install fakeredis)")
+
+    from api.v1.services.render_jobs import LANES
+    from core.caching.in_redis import cache
+
+    cache.client = FakeAsyncRedis()
+    for queue in LANES.values():
+        queue.client = cache.client
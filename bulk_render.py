@@ -0,0 +1,330 @@
+"""
+Офлайн-рендер большого набора скриншотов без HTTP API и опроса /result
+
+    python bulk_render.py requests.jsonl --output shots/
+    cat requests.jsonl | python bulk_render.py - --output shots.tar --workers 4
+
+Каждая строка входа — JSON PhantomScreenshot. Запись валидируется, логотип
+и курс SOL обрабатываются так же, как в POST /phantom, рендер идет
+параллельно на страницах пула (или в процессах при --workers). Изображения
+пишутся в каталог или tar-архив по мере готовности, имя файла — номер строки
+входа. Рядом с выходом ведется файл контрольной точки: повторный запуск с тем
+же входом продолжает с места остановки, ранее упавшие записи рендерятся снова.
+
+Нужен Redis из config.REDIS_URL: через него проходят логотипы и курс SOL.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import sys
+import tarfile
+import tempfile
+import time
+from pathlib import Path
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from api.v1.request_models.screenshots import PhantomScreenshot
+from api.v1.services.crypto_rates import get_crypto_price, price_provider
+from api.v1.services.logos import LogoError
+from api.v1.services.phantom import TEMPLATE_NAME, build_phantom_context, phantom_task_id, store_logo, warmup_contexts
+from api.v1.services.render_farm import RenderWorkerFarm
+from api.v1.services.results import FULL_SIZE
+from api.v1.services.screenshot_generator import screenshot_service
+from config import OUTPUT_FORMAT, PAGE_POOL_SIZE, RENDER_WORKERS, RESULT_SIZES, STARTUP_WARMUP
+from core.caching.in_redis import cache
+from core.imaging.encoder import image_encoder
+
+# Состояния записей в контрольной точке: invalid не повторяется (вход тот же), failed — повторяется
+OK = "ok"
+INVALID = "invalid"
+FAILED = "failed"
+
+
+class Checkpoint:
+    """Журнал обработанных строк входа: JSON-строка на запись, дописывается после сохранения файла"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[int, dict] = {}
+        self._file = None
+
+    def open(self, resume: bool):
+        if resume and self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Недописанная строка при аварийной остановке — запись будет обработана заново
+                        continue
+                    self.entries[entry["line"]] = entry
+        self._file = self.path.open("a" if resume else "w", encoding="utf-8")
+        if self._file.tell() and not self._ends_with_newline():
+            self._file.write("\n")
+
+    def _ends_with_newline(self) -> bool:
+        with self.path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def finished(self, line: int) -> bool:
+        entry = self.entries.get(line)
+        return entry is not None and entry["status"] in (OK, INVALID)
+
+    def archive_offset(self) -> int:
+        """Конец последнего файла, записанного в архив до остановки"""
+        return max((entry.get("offset") or 0 for entry in self.entries.values() if entry["status"] == OK), default=0)
+
+    def record(self, **entry):
+        self.entries[entry["line"]] = entry
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class DirectoryOutput:
+    """Файлы в каталоге; запись атомарная, поэтому прерванная запись не оставляет обрезанных файлов"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offset: int | None = None
+
+    def open(self, offset: int):
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def write(self, name: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp-", dir=self.path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self.path / name)
+
+    def close(self):
+        pass
+
+
+class TarOutput:
+    """
+    tar-архив, который дописывается по мере готовности
+
+    tar — последовательность заголовков и данных без оглавления в конце,
+    поэтому прерванный архив обрезается до конца последнего файла из
+    контрольной точки и продолжается с этого места.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.offset: int | None = 0
+        self._file = None
+        self._tar: tarfile.TarFile | None = None
+
+    def open(self, offset: int):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if offset and self.path.exists():
+            self._file = self.path.open("r+b")
+            self._file.seek(offset)
+            self._file.truncate()
+        else:
+            self._file = self.path.open("wb")
+        # TarFile начинает запись с текущей позиции файла
+        self._tar = tarfile.TarFile(fileobj=self._file, mode="w")
+        self.offset = self._tar.offset
+
+    def write(self, name: str, data: bytes):
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+        self._file.flush()
+        self.offset = self._tar.offset
+
+    def close(self):
+        if self._tar is not None:
+            self._tar.close()
+            self._file.close()
+            self._tar = None
+
+
+class Progress:
+    """Счетчики прогона, скорость и оценка оставшегося времени"""
+
+    def __init__(self, total: int | None, skipped: int):
+        self.total = total
+        self.skipped = skipped
+        self.counts = {OK: 0, INVALID: 0, FAILED: 0}
+        self.started = time.monotonic()
+
+    def add(self, status: str):
+        self.counts[status] += 1
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.processed / elapsed if elapsed else 0.0
+        done = self.skipped + self.processed
+        text = f"{done}/{self.total}" if self.total is not None else str(done)
+        text += (
+            f" (готово {self.counts[OK]}, невалидных {self.counts[INVALID]}, ошибок {self.counts[FAILED]},"
+            f" пропущено по контрольной точке {self.skipped}), {rate:.1f} изобр./с"
+        )
+        if self.total is not None and rate:
+            text += f", осталось ~{_format_duration(max(self.total - done, 0) / rate)}"
+        return text
+
+    async def report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            print(self.line(), file=sys.stderr, flush=True)
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def _count_lines(source: str) -> int | None:
+    """Число непустых строк входа для ETA; для stdin неизвестно"""
+    if source == "-":
+        return None
+    with open(source, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+async def _read_lines(source: str) -> AsyncIterator[tuple[int, str]]:
+    """Строки входа с номерами (с 1), без загрузки всего файла; чтение — вне event loop"""
+    f = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        line_no = 0
+        while line := await asyncio.to_thread(f.readline):
+            line_no += 1
+            if line.strip():
+                yield line_no, line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _open_output(path: Path) -> DirectoryOutput | TarOutput:
+    return TarOutput(path) if path.suffix == ".tar" else DirectoryOutput(path)
+
+
+class BulkRenderer:
+    """Рендер записей входа с ограничением числа одновременных рендеров"""
+
+    def __init__(self, renderer, output, checkpoint: Checkpoint, progress: Progress, args: argparse.Namespace):
+        self.renderer = renderer
+        self.output = output
+        self.checkpoint = checkpoint
+        self.progress = progress
+        self.args = args
+
+    async def run(self, lines: AsyncIterator[tuple[int, str]]):
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        tasks: set[asyncio.Task] = set()
+        async for line_no, text in lines:
+            if self.checkpoint.finished(line_no):
+                continue
+            # Вход читается не быстрее рендера: в памяти не больше concurrency записей
+            await semaphore.acquire()
+            task = asyncio.create_task(self._process(line_no, text))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _process(self, line_no: int, text: str):
+        try:
+            request = await store_logo(PhantomScreenshot.model_validate_json(text))
+        except (ValidationError, LogoError) as e:
+            self._record(line=line_no, status=INVALID, error=str(e))
+            return
+
+        try:
+            sol_price = self.args.sol_price or (await get_crypto_price("SOL", "usd"))["price"]
+            context = build_phantom_context(request, sol_price)
+            output_format = request.output_format or self.args.format
+            task_id = phantom_task_id(context, output_format)
+            image = await self.renderer.render_screenshot(context, TEMPLATE_NAME, task_id, output_format, store=False)
+            variants = {FULL_SIZE: image}
+            for size in request.sizes:
+                variants[size] = await image_encoder.resize(image, RESULT_SIZES[size], output_format)
+        except Exception as e:
+            self._record(line=line_no, status=FAILED, error=f"{type(e).__name__}: {e}")
+            return
+
+        extension = "jpg" if output_format == "jpeg" else output_format
+        files = []
+        for size, data in variants.items():
+            name = f"{line_no:06d}.{extension}" if size == FULL_SIZE else f"{line_no:06d}-{size}.{extension}"
+            self.output.write(name, data)
+            files.append(name)
+        self._record(line=line_no, status=OK, task_id=task_id, files=files, offset=self.output.offset)
+
+    def _record(self, **entry):
+        self.checkpoint.record(**entry)
+        self.progress.add(entry["status"])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL с записями PhantomScreenshot или - для stdin")
+    parser.add_argument("--output", type=Path, required=True, help="Каталог или файл .tar")
+    parser.add_argument("--checkpoint", type=Path, help="Файл контрольной точки (по умолчанию <output>.checkpoint)")
+    parser.add_argument("--fresh", action="store_true", help="Начать заново, не читая контрольную точку")
+    parser.add_argument("--workers", type=int, default=RENDER_WORKERS, help="Процессы-рендереры (0 — в этом процессе)")
+    parser.add_argument("--concurrency", type=int, help="Одновременных рендеров (по умолчанию — все страницы пулов)")
+    parser.add_argument("--format", default=OUTPUT_FORMAT, choices=("jpeg", "webp", "avif"))
+    parser.add_argument("--sol-price", type=float, help="Фиксированный курс SOL вместо CoinGecko")
+    parser.add_argument("--progress-interval", type=float, default=5.0, help="Период отчета о прогрессе, сек")
+    args = parser.parse_args()
+    if args.concurrency is None:
+        args.concurrency = PAGE_POOL_SIZE * max(args.workers, 1)
+
+    checkpoint = Checkpoint(args.checkpoint or args.output.with_name(args.output.name + ".checkpoint"))
+    checkpoint.open(resume=not args.fresh)
+    skipped = sum(checkpoint.finished(line) for line in checkpoint.entries)
+    if skipped:
+        print(f"Продолжение с контрольной точки {checkpoint.path}: пропускается записей {skipped}", file=sys.stderr)
+    output = _open_output(args.output)
+    output.open(checkpoint.archive_offset())
+    progress = Progress(_count_lines(args.input), skipped)
+
+    renderer = RenderWorkerFarm(args.workers) if args.workers > 0 else screenshot_service
+    await cache.start()
+    await price_provider.start()
+    await renderer.start()
+    reporter = None
+    try:
+        if STARTUP_WARMUP:
+            await renderer.warmup(warmup_contexts())
+        reporter = asyncio.create_task(progress.report(args.progress_interval))
+        await BulkRenderer(renderer, output, checkpoint, progress, args).run(_read_lines(args.input))
+    finally:
+        if reporter is not None:
+            reporter.cancel()
+        output.close()
+        checkpoint.close()
+        await renderer.stop()
+        await price_provider.close()
+        image_encoder.close()
+        await cache.close()
+
+    print(progress.line(), file=sys.stderr)
+    if progress.counts[FAILED]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
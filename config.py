@@ -1 +1,113 @@
-REDIS_URL = 'redis://redis:6379/0'
\ No newline at end of file
+import os
+
+REDIS_URL = 'redis://redis:6379/0'
+
+# Размер пула заранее созданных страниц Chromium
+PAGE_POOL_SIZE = int(os.getenv('PAGE_POOL_SIZE', 4))
+
+# Количество процессов-рендереров (0 — рендер в процессе API)
+RENDER_WORKERS = int(os.getenv('RENDER_WORKERS', 0))
+
+# Очередь задач рендера в Redis Streams
+JOB_STREAM = os.getenv('JOB_STREAM', 'render_jobs')
+JOB_GROUP = os.getenv('JOB_GROUP', 'renderers')
+# Максимум задач в очереди (ожидающих и выполняемых); при превышении API отвечает 429
+JOB_QUEUE_MAX_LENGTH = int(os.getenv('JOB_QUEUE_MAX_LENGTH', 1000))
+# Отдельная очередь пакетных задач: потребители берут из нее, только когда интерактивная пуста
+JOB_BATCH_STREAM = os.getenv('JOB_BATCH_STREAM', f'{JOB_STREAM}:batch')
+JOB_BATCH_QUEUE_MAX_LENGTH = int(os.getenv('JOB_BATCH_QUEUE_MAX_LENGTH', 10000))
+# Через сколько мс простоя задача упавшего воркера забирается другим
+JOB_CLAIM_IDLE_MS = int(os.getenv('JOB_CLAIM_IDLE_MS', 60000))
+JOB_MAX_DELIVERIES = int(os.getenv('JOB_MAX_DELIVERIES', 3))
+# Сколько задач один потребитель рендерит одновременно: верхняя граница адаптивного лимита
+RENDER_CONCURRENCY = int(os.getenv('RENDER_CONCURRENCY', PAGE_POOL_SIZE * max(RENDER_WORKERS, 1)))
+# Адаптивный лимит (AIMD): нижняя граница и латентность рендера в секундах, выше которой он снижается
+RENDER_CONCURRENCY_MIN = int(os.getenv('RENDER_CONCURRENCY_MIN', 1))
+RENDER_TARGET_LATENCY = float(os.getenv('RENDER_TARGET_LATENCY', 2.0))
+# Запускать потребителя очереди внутри процесса API (иначе — отдельный worker.py)
+EMBEDDED_WORKER = os.getenv('EMBEDDED_WORKER', '1') == '1'
+
+# Pub/sub канал уведомлений о завершении рендера
+RESULT_CHANNEL = os.getenv('RESULT_CHANNEL', 'render_results')
+
+# Режим рендера: hot — шаблон загружен в страницу пула, content — set_content на каждый рендер,
+# composite — как hot, но заново снимаются только динамические области поверх закэшированного фона
+RENDER_MODE = os.getenv('RENDER_MODE', 'hot')
+# Сколько статичных фоновых слоев (по шаблону и раскладке) хранит режим composite
+COMPOSITE_LAYERS = int(os.getenv('COMPOSITE_LAYERS', 16))
+
+# Кодирование изображений: формат по умолчанию, качество и размер пула процессов
+OUTPUT_FORMAT = os.getenv('OUTPUT_FORMAT', 'jpeg')
+JPEG_QUALITY = int(os.getenv('JPEG_QUALITY', 95))
+WEBP_QUALITY = int(os.getenv('WEBP_QUALITY', 80))
+AVIF_QUALITY = int(os.getenv('AVIF_QUALITY', 60))
+ENCODE_WORKERS = int(os.getenv('ENCODE_WORKERS', 2))
+
+# Пакетная генерация: максимум скриншотов в одном запросе и ожидание архива
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 500))
+BATCH_ARCHIVE_TIMEOUT = int(os.getenv('BATCH_ARCHIVE_TIMEOUT', 600))
+
+# Курсы CoinGecko: базовый URL (для тестов — локальная заглушка), ключ и время жизни
+COINGECKO_BASE_URL = os.getenv('COINGECKO_BASE_URL', 'https://api.coingecko.com/api/v3')
+COINGECKO_API_KEY = os.getenv('COINGECKO_API_KEY') or None
+PRICE_TTL = int(os.getenv('PRICE_TTL', 3600))
+# За сколько секунд до истечения TTL курс обновляется в фоне
+PRICE_REFRESH_AHEAD = int(os.getenv('PRICE_REFRESH_AHEAD', 300))
+# Сколько хранить устаревший курс, отдавая его во время обновления
+PRICE_STALE_TTL = int(os.getenv('PRICE_STALE_TTL', 86400))
+
+# Локальный кэш процесса перед Redis (0 — выключен): записей, байт и секунд жизни
+NEAR_CACHE_ITEMS = int(os.getenv('NEAR_CACHE_ITEMS', 1024))
+NEAR_CACHE_BYTES = int(os.getenv('NEAR_CACHE_BYTES', 64 * 1024 * 1024))
+NEAR_CACHE_TTL = float(os.getenv('NEAR_CACHE_TTL', 30))
+# Канал, через который процессы сбрасывают друг у друга записи локального кэша
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'cache_invalidation')
+# Сколько ключей удаляется одним UNLINK при инвалидации по паттерну или тегу
+CACHE_CHUNK_SIZE = int(os.getenv('CACHE_CHUNK_SIZE', 500))
+# Блокировка get_or_set между процессами: время жизни и ожидание значения, сек
+CACHE_LOCK_TTL = float(os.getenv('CACHE_LOCK_TTL', 30))
+CACHE_LOCK_WAIT = float(os.getenv('CACHE_LOCK_WAIT', 10))
+# Кодек для сжатых значений кэша (zstd, lz4, zlib, none) и порог сжатия в байтах
+CACHE_CODEC = os.getenv('CACHE_CODEC', 'zstd')
+CACHE_COMPRESS_MIN_SIZE = int(os.getenv('CACHE_COMPRESS_MIN_SIZE', 1024))
+# Сжатые значения до этого размера распаковываются прямо в event loop
+CACHE_INLINE_DECODE_MAX = int(os.getenv('CACHE_INLINE_DECODE_MAX', 64 * 1024))
+
+# Шаблоны: перечитывать при изменении файла (для разработки) и каталог байткода Jinja
+TEMPLATE_AUTO_RELOAD = os.getenv('TEMPLATE_AUTO_RELOAD', '0') == '1'
+TEMPLATE_BYTECODE_DIR = os.getenv('TEMPLATE_BYTECODE_DIR') or None
+# Прогревочный рендер каждого шаблона на всех страницах пула до приема трафика
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1') == '1'
+# Не запускаться, если шрифт Inter недоступен Chromium (иначе рендер молча идет fallback-шрифтом)
+REQUIRE_FONTS = os.getenv('REQUIRE_FONTS', '1') == '1'
+
+# Логотипы токенов: сторона миниатюры в пикселях (48 CSS px при device_scale_factor=2),
+# максимальный размер исходника в байтах и время хранения обработанного логотипа
+LOGO_SIZE = int(os.getenv('LOGO_SIZE', 96))
+LOGO_MAX_BYTES = int(os.getenv('LOGO_MAX_BYTES', 5 * 1024 * 1024))
+LOGO_TTL = int(os.getenv('LOGO_TTL', 7 * 86400))
+
+# Жизненный цикл Chromium: контекст пересоздается после N рендеров или когда RSS
+# процессов браузера превышает порог в МБ (0 — выключено)
+BROWSER_RECYCLE_RENDERS = int(os.getenv('BROWSER_RECYCLE_RENDERS', 2000))
+BROWSER_RECYCLE_RSS_MB = int(os.getenv('BROWSER_RECYCLE_RSS_MB', 1024))
+# Период проверки памяти и соединения с браузером, сек
+BROWSER_CHECK_INTERVAL = float(os.getenv('BROWSER_CHECK_INTERVAL', 10))
+# Сколько ждать рендеры на старом контексте, прежде чем закрыть его, сек
+BROWSER_DRAIN_TIMEOUT = float(os.getenv('BROWSER_DRAIN_TIMEOUT', 60))
+
+# Уменьшенные копии результата из одного снимка: имя -> ширина в пикселях
+RESULT_SIZES = {
+    name.strip(): int(width)
+    for name, width in (
+        item.split(':') for item in os.getenv('RESULT_SIZES', 'preview:480,thumbnail:160').split(',') if item
+    )
+}
+
+# Изображения результатов хранятся файлами по хэшу содержимого, в Redis — только указатели.
+# Каталог должен быть общим для API и воркеров; пределы объема в байтах и возраста в секундах
+# (0 — без предела) и период фоновой очистки
+BLOB_STORE_DIR = os.getenv('BLOB_STORE_DIR', '/tmp/screenshot_results')
+BLOB_STORE_MAX_BYTES = int(os.getenv('BLOB_STORE_MAX_BYTES', 10 * 1024 ** 3))
+BLOB_STORE_MAX_AGE = int(os.getenv('BLOB_STORE_MAX_AGE', 2 * 3600))
+BLOB_STORE_EVICT_INTERVAL = float(os.getenv('BLOB_STORE_EVICT_INTERVAL', 60))
@@ -0,0 +1,124 @@
+import json
+import mimetypes
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from playwright.async_api import BrowserContext, Route
+
+# Виртуальный хост, с которого страница запрашивает локальные ассеты
+ASSET_HOST = "https://assets.local/"
+
+_CONTENT_TYPES = {
+    ".woff2": "font/woff2",
+    ".woff": "font/woff",
+    ".ttf": "font/ttf",
+    ".otf": "font/otf",
+    ".css": "text/css; charset=utf-8",
+    ".svg": "image/svg+xml",
+    ".webp": "image/webp",
+}
+
+
+def _content_type(name: str) -> str:
+    suffix = Path(name).suffix.lower()
+    return _CONTENT_TYPES.get(suffix) or mimetypes.guess_type(name)[0] or "application/octet-stream"
+
+
+class AssetStore:
+    """
+    Ассеты рендера в памяти: шрифты, стили и картинки отдаются через перехват
+    запросов Playwright, все остальные сетевые запросы страницы блокируются
+
+    Файлы доступны странице по адресу ASSET_HOST + <путь в каталоге>.
+    manifest.json в каталоге сопоставляет внешние URL (по префиксу) локальным
+    файлам, например Google Fonts CSS -> fonts/inter.css. Ассеты, которых нет
+    в каталоге (например, загруженные пользователями логотипы), отдаются
+    загрузчиками, зарегистрированными через add_loader().
+    """
+
+    def __init__(self, assets_dir: Path):
+        """
+        Args:
+            assets_dir: Каталог с ассетами и необязательным manifest.json
+        """
+        self.assets_dir = assets_dir
+        self.served = 0
+        self.blocked = 0
+        self._files: dict[str, tuple[bytes, str]] = {}
+        self._aliases: dict[str, str] = {}
+        self._loaders: dict[str, Callable[[str], Awaitable[bytes | None]]] = {}
+
+    def load(self):
+        """Прочитать все файлы каталога в память"""
+        self._files.clear()
+        self._aliases.clear()
+        if not self.assets_dir.is_dir():
+            return
+
+        for path in self.assets_dir.rglob("*"):
+            if not path.is_file() or path.name == "manifest.json":
+                continue
+            self.add(path.relative_to(self.assets_dir).as_posix(), path.read_bytes())
+
+        manifest = self.assets_dir / "manifest.json"
+        if manifest.is_file():
+            self._aliases = json.loads(manifest.read_text(encoding="utf-8"))
+
+    def add(self, name: str, body: bytes, content_type: str | None = None):
+        """Добавить ассет в память под именем name (путь после ASSET_HOST)"""
+        self._files[name] = (body, content_type or _content_type(name))
+
+    def add_loader(self, prefix: str, loader: Callable[[str], Awaitable[bytes | None]]):
+        """
+        Ассеты с именем на prefix загружаются вызовом loader(name) на каждый запрос
+
+        Args:
+            prefix: Начало имени ассета (путь после ASSET_HOST)
+            loader: Async функция, возвращающая содержимое или None, если ассета нет
+        """
+        self._loaders[prefix] = loader
+
+    def resolve(self, url: str) -> tuple[bytes, str] | None:
+        if url.startswith(ASSET_HOST):
+            return self._files.get(url[len(ASSET_HOST):].split("?", 1)[0])
+        for prefix, name in self._aliases.items():
+            if url.startswith(prefix):
+                return self._files.get(name)
+        return None
+
+    async def attach(self, context: BrowserContext):
+        """Включить перехват всех запросов страниц контекста"""
+        await context.route("**/*", self._handle)
+
+    async def _load(self, url: str) -> tuple[bytes, str] | None:
+        if not url.startswith(ASSET_HOST):
+            return None
+        name = url[len(ASSET_HOST):].split("?", 1)[0]
+        for prefix, loader in self._loaders.items():
+            if not name.startswith(prefix):
+                continue
+            try:
+                body = await loader(name)
+            except Exception as e:
+                print(f"Ошибка загрузки ассета {name}: {e}")
+                return None
+            return (body, _content_type(name)) if body is not None else None
+        return None
+
+    async def _handle(self, route: Route):
+        asset = self.resolve(route.request.url) or await self._load(route.request.url)
+        if asset is None:
+            self.blocked += 1
+            await route.abort("blockedbyclient")
+            return
+
+        body, content_type = asset
+        self.served += 1
+        await route.fulfill(
+            status=200,
+            body=body,
+            headers={"Content-Type": content_type, "Access-Control-Allow-Origin": "*"},
+        )
+
+    def stats(self) -> dict:
+        return {"files": len(self._files), "served": self.served, "blocked": self.blocked}
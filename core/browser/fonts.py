@@ -0,0 +1,51 @@
+from playwright.async_api import Page
+
+# Выполняется на странице: загружает начертание и сравнивает ширину текста с fallback-шрифтом
+_PROBE_JS = """async (family) => {
+    try {
+        await document.fonts.load(`1em "${family}"`);
+    } catch (e) {}
+    await document.fonts.ready;
+    const faces = [...document.fonts].filter((face) => face.family.replaceAll('"', '') === family);
+    const canvas = document.createElement('canvas').getContext('2d');
+    const width = (font) => {
+        canvas.font = font;
+        return canvas.measureText('Hamburgefonstiv 0123456789').width;
+    };
+    return {
+        check: document.fonts.check(`1em "${family}"`),
+        loaded: faces.filter((face) => face.status === 'loaded').map((face) => face.weight),
+        failed: faces.filter((face) => face.status === 'error').map((face) => face.weight),
+        // Объявленный, но не найденный шрифт молча заменяется fallback: ширина совпадет с ним
+        rendered: width(`40px "${family}", monospace`) !== width('40px monospace'),
+    };
+}"""
+
+
+class FontMissingError(RuntimeError):
+    """Шрифт, объявленный стилями страницы, не загрузился: рендер пошел бы fallback-шрифтом"""
+
+
+async def probe_font(page: Page, family: str) -> dict:
+    """
+    Состояние шрифта на странице после загрузки ее стилей
+
+    Returns:
+        {"ok", "check", "loaded", "failed", "rendered"}; ok — шрифт загружен и действительно рисуется
+    """
+    state = await page.evaluate(_PROBE_JS, family)
+    state["ok"] = state["check"] and bool(state["loaded"]) and state["rendered"]
+    return state
+
+
+async def require_font(page: Page, family: str):
+    """
+    Raises:
+        FontMissingError: Шрифт не загружен или текст рисуется fallback-шрифтом
+    """
+    state = await probe_font(page, family)
+    if not state["ok"]:
+        raise FontMissingError(
+            f"Шрифт {family} недоступен странице рендера (check={state['check']}, loaded={state['loaded']},"
+            f" failed={state['failed']}, rendered={state['rendered']})"
+        )
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from playwright.async_api import BrowserContext, Page, Error as PlaywrightError
+
+from core.metrics.latency import LatencyStats
+from core.metrics.render import SCREENSHOT_STAGE_SECONDS
+
+
+class PoolClosedError(RuntimeError):
+    """Пул выведен из работы: страницу нужно взять из нового пула"""
+
+
+class PagePool:
+    """Ограниченный пул заранее созданных страниц Playwright с нужным размером viewport"""
+
+    def __init__(self, size: int, viewport: dict, wait_stats: LatencyStats | None = None):
+        """
+        Args:
+            size: Количество страниц в пуле (максимум одновременных рендеров)
+            viewport: Размер viewport, который выставляется страницам при создании
+            wait_stats: Статистика ожидания страницы, общая для сменяющих друг друга пулов
+        """
+        self.size = size
+        self.viewport = viewport
+        self.wait_stats = wait_stats or LatencyStats()
+        self.started_at: float | None = None
+        # Сколько раз страницы пула выдавались под рендер
+        self.acquired = 0
+        self.context: BrowserContext | None = None
+        self._idle: asyncio.Queue[Page | None] = asyncio.Queue()
+        self._crashed: set[Page] = set()
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._drained = asyncio.Event()
+        # Что загружено на странице, если она возвращается в пул без сброса
+        self.state: dict[Page, Any] = {}
+
+    async def start(self, context: BrowserContext):
+        """Создать все страницы пула на переданном контексте"""
+        self.context = context
+        pages = await asyncio.gather(*(self._new_page() for _ in range(self.size)))
+        for page in pages:
+            self._idle.put_nowait(page)
+        self.started_at = time.monotonic()
+
+    async def retire(self):
+        """
+        Вывести пул из работы
+
+        Свободные страницы закрываются, ожидающие acquire() получают
+        PoolClosedError, а занятые страницы закрываются при возврате —
+        drain() дождется последней.
+        """
+        self._closed = True
+        idle = []
+        while not self._idle.empty():
+            page = self._idle.get_nowait()
+            if page is not None:
+                idle.append(page)
+        for _ in range(self._waiting):
+            self._idle.put_nowait(None)
+        if self._in_use == 0:
+            self._drained.set()
+        for page in idle:
+            await self._close_page(page)
+        self._crashed.clear()
+        self.state.clear()
+
+    async def drain(self):
+        """Дождаться возврата всех страниц выведенного из работы пула"""
+        await self._drained.wait()
+
+    async def close(self):
+        """Закрыть свободные страницы; занятые закроются вместе с контекстом"""
+        await self.retire()
+
+    @property
+    def idle(self) -> int:
+        return 0 if self._closed else self._idle.qsize()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    async def acquire(self) -> Page:
+        """
+        Взять страницу из пула; если свободных нет — ждать возврата
+
+        Raises:
+            PoolClosedError: Пул выведен из работы до или во время ожидания
+        """
+        if self._closed:
+            raise PoolClosedError("Пул страниц выведен из работы")
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            page = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        if page is None:
+            raise PoolClosedError("Пул страниц выведен из работы")
+        self._in_use += 1
+        self.acquired += 1
+        waited = time.perf_counter() - started
+        self.wait_stats.observe(waited)
+        SCREENSHOT_STAGE_SECONDS.observe(waited, stage="page_acquire")
+        return page
+
+    async def release(self, page: Page, broken: bool = False, reset: bool = True):
+        """
+        Вернуть страницу в пул
+
+        Страница сбрасывается на about:blank; упавшая или сломанная
+        страница закрывается и заменяется новой, чтобы пул не уменьшался.
+
+        Args:
+            page: Страница, полученная через acquire()
+            broken: Рендер завершился ошибкой — страницу надо пересоздать
+            reset: Сбросить документ; False оставляет страницу и state как есть
+        """
+        self._in_use -= 1
+        if self._closed:
+            self._crashed.discard(page)
+            self.state.pop(page, None)
+            await self._close_page(page)
+            if self._in_use == 0:
+                self._drained.set()
+            return
+
+        if not broken and page not in self._crashed and not page.is_closed():
+            if not reset:
+                self._idle.put_nowait(page)
+                return
+            try:
+                self.state.pop(page, None)
+                await page.goto("about:blank")
+                self._idle.put_nowait(page)
+                return
+            except PlaywrightError:
+                pass
+
+        self._crashed.discard(page)
+        self.state.pop(page, None)
+        await self._close_page(page)
+        try:
+            self._idle.put_nowait(await self._new_page())
+        except PlaywrightError as e:
+            # Контекст или браузер уже закрыт — пул заменит ScreenshotService
+            print(f"Не удалось пересоздать страницу пула: {e}")
+
+    @asynccontextmanager
+    async def page(self, reset: bool = True) -> AsyncIterator[Page]:
+        """Контекстный менеджер: acquire() + release() с пометкой ошибок"""
+        page = await self.acquire()
+        broken = False
+        try:
+            yield page
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            await self.release(page, broken=broken, reset=reset)
+
+    @staticmethod
+    async def _close_page(page: Page):
+        if not page.is_closed():
+            try:
+                await page.close()
+            except PlaywrightError:
+                pass
+
+    async def _new_page(self) -> Page:
+        page = await self.context.new_page()
+        await page.set_viewport_size(self.viewport)
+        page.on("crash", self._crashed.add)
+        return page
@@ -0,0 +1,94 @@
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import msgpack
+
+from config import CACHE_CODEC, CACHE_COMPRESS_MIN_SIZE
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+class CodecError(Exception):
+    """Значение не удалось распаковать"""
+
+
+@dataclass(frozen=True)
+class Codec:
+    name: str
+    # Первый байт значения в Redis — по нему выбирается кодек при чтении
+    header: int
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+CODECS: dict[str, Codec] = {}
+_BY_HEADER: dict[int, Codec] = {}
+
+# Записи без заголовка (до появления кодеков) — zlib-поток, он всегда начинается с 0x78
+_LEGACY_ZLIB_HEADER = 0x78
+
+
+def register_codec(codec: Codec):
+    if codec.header == _LEGACY_ZLIB_HEADER:
+        raise ValueError(f"Заголовок 0x{codec.header:02x} занят старым форматом zlib")
+    CODECS[codec.name] = codec
+    _BY_HEADER[codec.header] = codec
+
+
+register_codec(Codec("none", 0x00, bytes, bytes))
+register_codec(Codec("zlib", 0x01, zlib.compress, zlib.decompress))
+if zstandard is not None:
+    register_codec(Codec(
+        "zstd",
+        0x02,
+        zstandard.ZstdCompressor(level=3).compress,
+        zstandard.ZstdDecompressor().decompress,
+    ))
+if lz4 is not None:
+    register_codec(Codec("lz4", 0x03, lz4.frame.compress, lz4.frame.decompress))
+
+# Кодек из config, если его библиотека установлена
+DEFAULT_CODEC = CACHE_CODEC if CACHE_CODEC in CODECS else "zlib"
+
+
+def encode_value(values: Any, codec: str = DEFAULT_CODEC, min_size: int = CACHE_COMPRESS_MIN_SIZE) -> bytes:
+    """
+    msgpack + сжатие кодеком с байтом заголовка
+
+    Значения меньше min_size байт не сжимаются: выигрыш в размере
+    меньше затрат на сжатие и распаковку.
+    """
+    packed = msgpack.packb(values, use_bin_type=True)
+    selected = CODECS[codec] if len(packed) >= min_size else CODECS["none"]
+    return bytes([selected.header]) + selected.compress(packed)
+
+
+def decode_value(data: bytes) -> Any:
+    """
+    Распаковать значение, записанное encode_value или старым форматом msgpack+zlib
+
+    Raises:
+        CodecError: Неизвестный заголовок или поврежденные данные
+    """
+    header = data[0]
+    try:
+        if header == _LEGACY_ZLIB_HEADER:
+            packed = zlib.decompress(data)
+        elif header in _BY_HEADER:
+            packed = _BY_HEADER[header].decompress(data[1:])
+        else:
+            raise CodecError(f"Неизвестный кодек 0x{header:02x}")
+        return msgpack.unpackb(packed, raw=False)
+    except CodecError:
+        raise
+    except Exception as e:
+        raise CodecError(str(e)) from e
@@ -1,43 +1,183 @@
 import asyncio
+import functools
 import json
-import zlib
-from typing import Any, Optional, List
+import math
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, Optional, List
 
-import msgpack
 import redis.asyncio as redis
 
-from config import REDIS_URL
+from config import (
+    REDIS_URL,
+    NEAR_CACHE_ITEMS,
+    NEAR_CACHE_BYTES,
+    NEAR_CACHE_TTL,
+    CACHE_INVALIDATION_CHANNEL,
+    CACHE_CHUNK_SIZE,
+    CACHE_LOCK_TTL,
+    CACHE_LOCK_WAIT,
+    CACHE_COMPRESS_MIN_SIZE,
+    CACHE_INLINE_DECODE_MAX,
+)
+from core.caching.codecs import DEFAULT_CODEC, CODECS, CodecError, encode_value, decode_value
+from core.caching.near_cache import NearCache
+from core.metrics.prometheus import registry
+
+LOCK_FENCE_KEY = "lock:fence"
+LOCK_POLL_INTERVAL = 0.05
+
+CACHE_REQUESTS = registry.counter(
+    "cache_requests_total",
+    "Чтения кэша по семейству ключей (price, phantom, batch, ...) и результату",
+    ("family", "result"),
+)
+_KEY_FAMILY = re.compile(r"[A-Za-z]+")
+
+# KEYS: блокировка, счетчик токенов; ARGV: время жизни блокировки в мс
+_ACQUIRE_LOCK_LUA = """
+local token = redis.call('incr', KEYS[2])
+if redis.call('set', KEYS[1], token, 'NX', 'PX', ARGV[1]) then
+    return token
+end
+return nil
+"""
+
+# KEYS: блокировка; ARGV: токен владельца
+_RELEASE_LOCK_LUA = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# KEYS: ключ, ключ XFetch, блокировка, теги...; ARGV: токен ('' — без блокировки), ttl, значение, delta
+_FENCED_SET_LUA = """
+if ARGV[1] ~= '' then
+    if redis.call('get', KEYS[3]) ~= ARGV[1] then
+        return 0
+    end
+    redis.call('del', KEYS[3])
+end
+redis.call('setex', KEYS[1], ARGV[2], ARGV[3])
+redis.call('setex', KEYS[2], ARGV[2], ARGV[4])
+for i = 4, #KEYS do
+    redis.call('sadd', KEYS[i], KEYS[1])
+    redis.call('expire', KEYS[i], ARGV[2], 'NX')
+    redis.call('expire', KEYS[i], ARGV[2], 'GT')
+end
+return 1
+"""
 
 
 class AsyncRedisCache:
     """Универсальный асинхронный класс для кэширования в Redis с инвалидацией"""
 
-    def __init__(self, redis_url: str):
+    def __init__(
+        self,
+        redis_url: str,
+        near_cache: Optional[NearCache] = None,
+        invalidation_channel: str = CACHE_INVALIDATION_CHANNEL,
+        chunk_size: int = CACHE_CHUNK_SIZE,
+        codec: str = DEFAULT_CODEC,
+        compress_min_size: int = CACHE_COMPRESS_MIN_SIZE,
+        inline_decode_max: int = CACHE_INLINE_DECODE_MAX,
+    ):
         """
         Args:
             redis_url: URL подключения к Redis (например, redis://localhost:6379/0)
+            near_cache: Локальный кэш процесса перед Redis (None — без него)
+            invalidation_channel: Канал, через который процессы сбрасывают
+                записи near_cache друг у друга
+            chunk_size: Размер порции ключей при массовом удалении
+            codec: Кодек для compress=True (none, zlib, zstd, lz4)
+            compress_min_size: Значения меньше этого размера не сжимаются
+            inline_decode_max: Значения до этого размера распаковываются
+                в event loop, большие — в пуле потоков
         """
         self.client = redis.from_url(redis_url)
         self.pubsub = None
         self._invalidation_callbacks = []
         self._listener_task = None
+        self.near_cache = near_cache
+        self.invalidation_channel = invalidation_channel
+        self.chunk_size = chunk_size
+        if codec not in CODECS:
+            raise ValueError(f"Кодек {codec} недоступен, есть: {', '.join(CODECS)}")
+        self.codec = codec
+        self.compress_min_size = compress_min_size
+        self.inline_decode_max = inline_decode_max
+        # Отличает собственные сообщения об инвалидации от чужих
+        self._origin = uuid.uuid4().hex
+        self._near_subscribed = False
+        self._computing: dict[str, asyncio.Future] = {}
+        self._background: set[asyncio.Future] = set()
+        self._acquire_script = self.client.register_script(_ACQUIRE_LOCK_LUA)
+        self._store_script = self.client.register_script(_FENCED_SET_LUA)
+        self._release_script = self.client.register_script(_RELEASE_LOCK_LUA)
+
+    async def start(self):
+        """
+        Включить near_cache: подписаться на канал инвалидации
 
-    async def get(self, key: str, compressed: bool = False, raw: bool = False) -> Optional[Any]:
-        data = await self.client.get(key)
-        if not data:
-            return None
+        До вызова (и после обрыва подписки) чтения идут напрямую в Redis,
+        иначе процесс мог бы не узнать об изменении ключа другим процессом.
+        """
+        if self.near_cache is None or self._near_subscribed:
+            return
+        await self.subscribe_invalidation(self.invalidation_channel)
+        # Записи, попавшие в near_cache до подписки, могли пропустить инвалидацию
+        self.near_cache.clear()
+        self._near_subscribed = True
 
-        if raw:
-            return data  # возвращаем bytes как есть
+    def stats(self) -> dict:
+        return {"near_cache": self.near_cache.stats() if self.near_cache else None}
 
-        if compressed:
-            return await self._deserialize_data_async(data)
+    async def get(self, key: str, compressed: bool = False, raw: bool = False) -> Optional[Any]:
+        data = await self._read(key)
+        self._count(key, data)
+        return await self._decode(data, compressed, raw)
 
-        try:
-            return json.loads(data)
-        except json.JSONDecodeError as e:
-            print(f"Ошибка JSON декодирования: {e}")
-            return None
+    async def get_many(
+        self, keys: List[str], compressed: bool = False, raw: bool = False
+    ) -> Dict[str, Optional[Any]]:
+        """
+        Получить несколько ключей за один запрос к Redis
+
+        Returns:
+            {key: значение или None}, в порядке keys
+        """
+        found: Dict[str, Optional[bytes]] = {}
+        missing = []
+        near_active = self._near_active()
+        for key in dict.fromkeys(keys):
+            data = self.near_cache.get(key) if near_active else None
+            if data is None:
+                missing.append(key)
+            else:
+                found[key] = data
+
+        if missing:
+            if near_active:
+                version = self.near_cache.version
+                async with self.client.pipeline(transaction=False) as pipe:
+                    for key in missing:
+                        pipe.get(key)
+                        pipe.pttl(key)
+                    results = await pipe.execute()
+                fresh = self.near_cache.version == version
+                for key, data, pttl in zip(missing, results[::2], results[1::2]):
+                    found[key] = data
+                    if data and fresh:
+                        self.near_cache.set(key, data, pttl / 1000 if pttl > 0 else None)
+            else:
+                found.update(zip(missing, await self.client.mget(missing)))
+
+        for key in keys:
+            self._count(key, found[key])
+        return {key: await self._decode(found[key], compressed, raw) for key in keys}
 
     async def set(
             self,
@@ -48,21 +188,51 @@ class AsyncRedisCache:
             raw: bool = False,  # ← новый параметр
             tags: Optional[List[str]] = None,
     ):
-        if raw:
-            # bytes сохраняем напрямую, без сериализации
-            await self.client.setex(key, ttl, values)
-        elif compress:
-            packed = msgpack.packb(values, use_bin_type=True)
-            values = zlib.compress(packed)
-            await self.client.setex(key, ttl, values)
-        else:
-            await self.client.setex(key, ttl, json.dumps(values))
+        await self.set_many({key: values}, ttl, compress=compress, raw=raw, tags=tags)
+
+    async def set_many(
+            self,
+            items: Dict[str, Any],
+            ttl: int,
+            compress: bool = False,
+            raw: bool = False,
+            tags: Optional[List[str]] = None,
+    ):
+        """
+        Записать несколько ключей одной транзакцией
+
+        Значения и привязка к тегам пишутся в одном MULTI/EXEC: тег
+        не может ссылаться на незаписанный ключ и наоборот.
+
+        Args:
+            items: {key: значение}
+            ttl: Время жизни в секундах
+            compress: Использовать сжатие
+            raw: Значения — bytes, сохраняются как есть
+            tags: Теги для всех ключей
+        """
+        if not items:
+            return
 
-        if tags:
-            for tag in tags:
+        encoded = {key: self._encode(values, compress, raw) for key, values in items.items()}
+        async with self.client.pipeline(transaction=True) as pipe:
+            for key, data in encoded.items():
+                pipe.setex(key, ttl, data)
+            for tag in tags or ():
                 tag_key = f"tag:{tag}"
-                await self.client.sadd(tag_key, key)
-                await self.client.expire(tag_key, ttl)
+                pipe.sadd(tag_key, *encoded)
+                # Тег живет не меньше самого долгого из своих ключей
+                pipe.expire(tag_key, ttl, nx=True)
+                pipe.expire(tag_key, ttl, gt=True)
+            if self.near_cache is not None:
+                for key in encoded:
+                    self._publish_near(pipe, "near", key)
+            await pipe.execute()
+
+        # Без подписки near_cache не узнает об изменении ключа другим процессом — не пишем в него
+        if self._near_active():
+            for key, data in encoded.items():
+                self.near_cache.set(key, data, ttl)
 
     async def delete(self, key: str) -> int:
         """
@@ -71,30 +241,55 @@ class AsyncRedisCache:
         Returns:
             Количество удаленных ключей
         """
-        return await self.client.delete(key)
+        return await self.delete_many([key])
+
+    async def delete_many(self, keys: List[str]) -> int:
+        """
+        Удалить ключи через UNLINK порциями по chunk_size
+
+        Returns:
+            Количество удаленных ключей
+        """
+        count = 0
+        for i in range(0, len(keys), self.chunk_size):
+            count += await self._unlink(keys[i:i + self.chunk_size])
+        return count
 
     async def invalidate_by_pattern(self, pattern: str) -> int:
         """
         Инвалидация по паттерну (например, "user:*")
 
+        Ключи удаляются по мере обхода SCAN порциями через UNLINK —
+        список всех ключей в памяти не собирается, Redis не блокируется.
+
         Args:
             pattern: Паттерн для поиска ключей (поддерживает * и ?)
 
         Returns:
             Количество удаленных ключей
         """
-        keys = []
-        async for key in self.client.scan_iter(match=pattern):
-            keys.append(key)
-
-        if keys:
-            return await self.client.delete(*keys)
-        return 0
+        count = 0
+        chunk = []
+        async for key in self.client.scan_iter(match=pattern, count=self.chunk_size):
+            chunk.append(key)
+            if len(chunk) >= self.chunk_size:
+                count += await self._unlink(chunk, notify=False)
+                chunk = []
+        if chunk:
+            count += await self._unlink(chunk, notify=False)
+
+        if self.near_cache is not None:
+            # Одно сообщение на паттерн вместо сообщения на каждый ключ
+            self.near_cache.discard_pattern(pattern)
+            await self.client.publish(self.invalidation_channel, self._near_message("nearpattern", pattern))
+        return count
 
     async def invalidate_by_tag(self, tag: str) -> int:
         """
         Инвалидация всех ключей, связанных с тегом
 
+        Участники тега читаются SSCAN и удаляются порциями через UNLINK.
+
         Args:
             tag: Тег для инвалидации (например, "user:123")
 
@@ -102,20 +297,24 @@ class AsyncRedisCache:
             Количество удаленных ключей
         """
         tag_key = f"tag:{tag}"
-        keys = await self.client.smembers(tag_key)
 
         count = 0
-        if keys:
-            # Удаляем все ключи, связанные с тегом
-            count = await self.client.delete(*keys)
-            # Удаляем сам тег
-            await self.client.delete(tag_key)
-
+        chunk = []
+        async for key in self.client.sscan_iter(tag_key, count=self.chunk_size):
+            chunk.append(key)
+            if len(chunk) >= self.chunk_size:
+                count += await self._unlink(chunk)
+                chunk = []
+        if chunk:
+            count += await self._unlink(chunk)
+
+        # Удаляем сам тег
+        await self.client.unlink(tag_key)
         return count
 
     async def invalidate_multiple_tags(self, tags: List[str]) -> int:
         """
-        Инвалидация по нескольким тегам
+        Инвалидация по нескольким тегам (теги обрабатываются параллельно)
 
         Args:
             tags: Список тегов для инвалидации
@@ -123,11 +322,8 @@ class AsyncRedisCache:
         Returns:
             Общее количество удаленных ключей
         """
-        total_count = 0
-        for tag in tags:
-            count = await self.invalidate_by_tag(tag)
-            total_count += count
-        return total_count
+        counts = await asyncio.gather(*(self.invalidate_by_tag(tag) for tag in dict.fromkeys(tags)))
+        return sum(counts)
 
     async def publish_invalidation(self, channel: str, message: str):
         """
@@ -189,6 +385,8 @@ class AsyncRedisCache:
         - "key:some_key" - удалить конкретный ключ
         - "pattern:user:*" - удалить по паттерну
         - "tag:user:123" - удалить по тегу
+        - "near:<origin>:some_key" - сбросить ключ только в near_cache
+        - "nearpattern:<origin>:user:*" - сбросить ключи near_cache по паттерну
         """
         parts = message.split(":", 1)
         if len(parts) != 2:
@@ -202,6 +400,14 @@ class AsyncRedisCache:
             await self.invalidate_by_pattern(value)
         elif invalidation_type == "tag":
             await self.invalidate_by_tag(value)
+        elif invalidation_type in ("near", "nearpattern") and self.near_cache is not None:
+            origin, _, target = value.partition(":")
+            if origin == self._origin:
+                return
+            if invalidation_type == "near":
+                self.near_cache.discard(target)
+            else:
+                self.near_cache.discard_pattern(target)
 
     async def exists(self, key: str) -> bool:
         """Проверить существование ключа"""
@@ -237,37 +443,225 @@ class AsyncRedisCache:
         factory: callable,
         ttl: int,
         compress: bool = False,
+        raw: bool = False,
         tags: Optional[List[str]] = None,
+        lock: bool = False,
+        lock_ttl: float = CACHE_LOCK_TTL,
+        lock_wait: float = CACHE_LOCK_WAIT,
+        xfetch_beta: float = 0.0,
     ) -> Any:
         """
         Получить значение из кэша или создать его через factory функцию
 
+        Одновременные промахи в процессе ждут один вызов factory. С lock=True
+        то же выполняется между процессами через блокировку в Redis: остальные
+        процессы ждут значение до lock_wait, а запись проверяет токен
+        блокировки (fencing), поэтому владелец с истекшей блокировкой не
+        перезапишет более новое значение.
+
         Args:
             key: Ключ Redis
             factory: Async функция для генерации данных при отсутствии в кэше
             ttl: Время жизни в секундах
             compress: Использовать сжатие
+            raw: factory возвращает bytes, они сохраняются как есть
             tags: Теги для группировки
+            lock: Блокировка между процессами
+            lock_ttl: Время жизни блокировки в секундах
+            lock_wait: Сколько секунд ждать значение от владельца блокировки
+            xfetch_beta: Вероятностное раннее обновление (XFetch), 0 — выключено;
+                больше 1 — обновлять раньше
 
         Returns:
             Данные из кэша или созданные через factory
         """
+        compute = functools.partial(
+            self._compute_once, key, factory, ttl, compress, raw, tags, lock, lock_ttl, lock_wait
+        )
+
         # Проверяем кэш
-        cached = await self.get(key, compressed=compress)
-        if cached is not None:
-            return cached
+        if xfetch_beta > 0:
+            cached, remaining, delta = await self._read_xfetch(key, compress, raw)
+            if cached is not None:
+                # XFetch: чем ближе истечение и дольше пересчет, тем вероятнее
+                # обновить заранее; остальные продолжают получать текущее значение
+                if delta and -delta * xfetch_beta * math.log(1.0 - random.random()) >= remaining:
+                    self._refresh_early(key, compute)
+                return cached
+        else:
+            cached = await self.get(key, compressed=compress, raw=raw)
+            if cached is not None:
+                return cached
+
+        return await compute()
+
+    async def _compute_once(
+        self,
+        key: str,
+        factory: callable,
+        ttl: int,
+        compress: bool,
+        raw: bool,
+        tags: Optional[List[str]],
+        lock: bool,
+        lock_ttl: float,
+        lock_wait: float,
+        recheck: bool = True,
+    ) -> Any:
+        """Single-flight: один вызов _compute на ключ в процессе"""
+        task = self._computing.get(key)
+        if task is None:
+            task = asyncio.ensure_future(
+                self._compute(key, factory, ttl, compress, raw, tags, lock, lock_ttl, lock_wait, recheck)
+            )
+            self._computing[key] = task
+            task.add_done_callback(lambda _: self._computing.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _compute(
+        self,
+        key: str,
+        factory: callable,
+        ttl: int,
+        compress: bool,
+        raw: bool,
+        tags: Optional[List[str]],
+        lock: bool,
+        lock_ttl: float,
+        lock_wait: float,
+        recheck: bool = True,
+    ) -> Any:
+        """
+        Args:
+            recheck: Перечитать кэш после взятия блокировки (False — для раннего
+                обновления XFetch, где значение в кэше есть намеренно)
+        """
+        token = None
+        if lock:
+            deadline = time.monotonic() + lock_wait
+            while (token := await self._acquire_lock(key, lock_ttl)) is None:
+                # Значение считает другой процесс — ждем его результат
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+                cached = await self.get(key, compressed=compress, raw=raw)
+                if cached is not None:
+                    return cached
+                if time.monotonic() >= deadline:
+                    break
+
+            if token is not None and recheck:
+                # Другой процесс мог записать значение и отпустить блокировку
+                # между нашим промахом и взятием блокировки
+                cached = await self.get(key, compressed=compress, raw=raw)
+                if cached is not None:
+                    await self._release_lock(key, token)
+                    return cached
 
         # Генерируем данные
-        if asyncio.iscoroutinefunction(factory):
-            data = await factory()
-        else:
-            data = factory()
+        started = time.monotonic()
+        try:
+            if asyncio.iscoroutinefunction(factory):
+                data = await factory()
+            else:
+                data = factory()
+        except BaseException:
+            # Без этого блокировка висела бы lock_ttl, а остальные ждали бы lock_wait впустую
+            if token is not None:
+                await asyncio.shield(self._release_lock(key, token))
+            raise
+        delta = time.monotonic() - started
+
+        if lock and token is None:
+            # Не дождались владельца блокировки: отдаем свой результат, но не пишем
+            return data
 
         # Сохраняем в кэш
-        await self.set(key, data, ttl, compress=compress, tags=tags)
-
+        if not await self._store(key, data, ttl, compress, raw, tags, token, delta):
+            print(f"Блокировка {key} истекла до записи — значение не сохранено")
         return data
 
+    def _refresh_early(self, key: str, compute: callable):
+        if key in self._computing:
+            return
+        task = asyncio.ensure_future(compute(recheck=False))
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    def _background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Ошибка раннего обновления кэша: {task.exception()}")
+
+    async def _acquire_lock(self, key: str, lock_ttl: float) -> Optional[int]:
+        """Взять блокировку; возвращает монотонный токен или None, если она занята"""
+        token = await self._acquire_script(
+            keys=[self._lock_key(key), LOCK_FENCE_KEY], args=[int(lock_ttl * 1000)], client=self.client
+        )
+        return int(token) if token is not None else None
+
+    async def _release_lock(self, key: str, token: int) -> bool:
+        """Снять блокировку, только если она все еще принадлежит токену"""
+        released = await self._release_script(keys=[self._lock_key(key)], args=[token], client=self.client)
+        return bool(released)
+
+    async def _store(
+        self,
+        key: str,
+        values: Any,
+        ttl: int,
+        compress: bool,
+        raw: bool,
+        tags: Optional[List[str]],
+        token: Optional[int],
+        delta: float,
+    ) -> bool:
+        """
+        Записать значение, время его вычисления и теги; с token — только
+        если блокировка все еще принадлежит этому токену
+
+        Returns:
+            False, если блокировка истекла или перешла к другому
+        """
+        data = self._encode(values, compress, raw)
+        stored = await self._store_script(
+            keys=[key, self._xfetch_key(key), self._lock_key(key), *(f"tag:{tag}" for tag in tags or ())],
+            args=["" if token is None else token, ttl, data, delta],
+            client=self.client,
+        )
+        if not stored:
+            return False
+
+        if self.near_cache is not None:
+            await self.client.publish(self.invalidation_channel, self._near_message("near", key))
+            if self._near_active():
+                self.near_cache.set(key, data, ttl)
+        return True
+
+    async def _read_xfetch(self, key: str, compress: bool, raw: bool) -> tuple[Optional[Any], float, float]:
+        """
+        Returns:
+            (значение, секунд до истечения, секунд на вычисление)
+        """
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            pipe.get(self._xfetch_key(key))
+            data, pttl, delta = await pipe.execute()
+        self._count(key, data)
+        return await self._decode(data, compress, raw), pttl / 1000, float(delta) if delta else 0.0
+
+    @staticmethod
+    def _count(key: str, data: Optional[bytes]):
+        family = _KEY_FAMILY.match(key)
+        CACHE_REQUESTS.inc(family=family.group() if family else "other", result="hit" if data else "miss")
+
+    @staticmethod
+    def _lock_key(key: str) -> str:
+        return f"lock:{key}"
+
+    @staticmethod
+    def _xfetch_key(key: str) -> str:
+        return f"xfetch:{key}"
+
     async def close(self):
         """Закрыть соединение с Redis"""
         if self._listener_task:
@@ -283,29 +677,105 @@ class AsyncRedisCache:
 
         await self.client.close()
 
+    async def _unlink(self, keys: list, notify: bool = True) -> int:
+        """
+        UNLINK порции ключей; освобождение памяти Redis делает в фоне
+
+        Args:
+            keys: Ключи (str или bytes из SCAN)
+            notify: Сбросить ключи в near_cache этого и других процессов
+        """
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            if notify and self.near_cache is not None:
+                for key in keys:
+                    key = key.decode() if isinstance(key, bytes) else key
+                    self.near_cache.discard(key)
+                    self._publish_near(pipe, "near", key)
+            results = await pipe.execute()
+        return results[0]
+
+    async def _read(self, key: str) -> Optional[bytes]:
+        """Значение ключа из near_cache или из Redis (с заполнением near_cache)"""
+        if not self._near_active():
+            return await self.client.get(key)
+
+        data = self.near_cache.get(key)
+        if data is not None:
+            return data
+
+        version = self.near_cache.version
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            data, pttl = await pipe.execute()
+        if data and self.near_cache.version == version:
+            # Запись в near_cache не должна пережить ключ в Redis
+            self.near_cache.set(key, data, pttl / 1000 if pttl > 0 else None)
+        return data
+
+    def _near_active(self) -> bool:
+        if self.near_cache is None or not self._near_subscribed:
+            return False
+        if self._listener_task is None or self._listener_task.done():
+            # Подписка оборвалась — сообщения об инвалидации могли потеряться
+            self._near_subscribed = False
+            self.near_cache.clear()
+            return False
+        return True
+
+    def _publish_near(self, pipe, invalidation_type: str, value: str):
+        pipe.publish(self.invalidation_channel, self._near_message(invalidation_type, value))
+
+    def _near_message(self, invalidation_type: str, value: str) -> str:
+        return f"{invalidation_type}:{self._origin}:{value}"
+
+    def _encode(self, values: Any, compress: bool, raw: bool) -> bytes:
+        if raw:
+            # bytes сохраняем напрямую, без сериализации
+            return values
+        if compress:
+            return encode_value(values, self.codec, self.compress_min_size)
+        return json.dumps(values).encode()
+
+    async def _decode(self, data: Optional[bytes], compressed: bool, raw: bool) -> Optional[Any]:
+        if not data:
+            return None
+
+        if raw:
+            return data  # возвращаем bytes как есть
+
+        if compressed:
+            if len(data) <= self.inline_decode_max:
+                # Переход в пул потоков дороже распаковки маленького значения
+                return self._deserialize_data(data)
+            return await self._deserialize_data_async(data)
+
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError as e:
+            print(f"Ошибка JSON декодирования: {e}")
+            return None
+
     @staticmethod
-    async def _deserialize_data_async(compressed_data: bytes) -> Any:
+    def _deserialize_data(compressed_data: bytes) -> Any:
+        try:
+            return decode_value(compressed_data)
+        except CodecError as e:
+            print(f"Ошибка декодирования: {e}")
+            return None
+
+    @classmethod
+    async def _deserialize_data_async(cls, compressed_data: bytes) -> Any:
         """Асинхронная десериализация сжатых данных"""
         if compressed_data is None:
             return None
 
         loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, cls._deserialize_data, compressed_data)
 
-        def _deserialize():
-            try:
-                serialized_data = zlib.decompress(compressed_data)
-                data = msgpack.unpackb(serialized_data, raw=False)
-                return data
-            except (
-                zlib.error,
-                msgpack.ExtraData,
-                msgpack.FormatError,
-                msgpack.StackError,
-            ) as e:
-                print(f"Ошибка декодирования: {e}")
-                return None
-
-        return await loop.run_in_executor(None, _deserialize)
-
-
-cache = AsyncRedisCache(REDIS_URL)
+
+cache = AsyncRedisCache(
+    REDIS_URL,
+    near_cache=NearCache(NEAR_CACHE_ITEMS, NEAR_CACHE_BYTES, NEAR_CACHE_TTL) if NEAR_CACHE_ITEMS > 0 else None,
+)
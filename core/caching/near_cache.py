@@ -0,0 +1,108 @@
+import fnmatch
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class NearCache:
+    """
+    Локальный LRU-кэш процесса перед Redis с ограничением по числу записей,
+    суммарному размеру и времени жизни
+
+    Хранит значения в том виде, в каком они лежат в Redis (bytes), поэтому
+    размер считается точно, а вызывающий код не может испортить кэш,
+    изменив полученный объект.
+    """
+
+    def __init__(self, max_items: int, max_bytes: int, ttl: float):
+        """
+        Args:
+            max_items: Максимум записей
+            max_bytes: Максимальный суммарный размер значений в байтах
+            ttl: Максимальное время жизни записи в секундах
+        """
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # Растет при каждой инвалидации: значение, прочитанное из Redis до нее,
+        # может быть устаревшим и не кладется в кэш
+        self.version = 0
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        data, expires_at = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes, ttl: Optional[float] = None):
+        """
+        Args:
+            key: Ключ
+            data: Значение в том виде, в каком оно хранится в Redis
+            ttl: Оставшееся время жизни ключа в Redis — запись не переживет его
+        """
+        self._remove(key)
+        if len(data) > self.max_bytes:
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (data, time.monotonic() + ttl)
+        self._bytes += len(data)
+        while len(self._entries) > self.max_items or self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def discard(self, key: str):
+        self.version += 1
+        if self._remove(key):
+            self.invalidations += 1
+
+    def discard_pattern(self, pattern: str):
+        """Удалить записи по glob-паттерну Redis (* и ?)"""
+        self.version += 1
+        for key in [key for key in self._entries if fnmatch.fnmatchcase(key, pattern)]:
+            self.discard(key)
+
+    def clear(self):
+        self.version += 1
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "items": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= len(entry[0])
+        return True
@@ -0,0 +1,29 @@
+import hashlib
+
+# Результаты рендера не меняются: клиенты и CDN хранят их без перепроверки
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Страницы меняются с деплоем: хранить можно, но перед показом — перепроверить по ETag
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+NO_STORE_CACHE_CONTROL = "no-store"
+
+
+def make_etag(content: bytes) -> str:
+    """Сильный ETag по хэшу содержимого"""
+    return '"' + hashlib.blake2b(content, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Совпадает ли ETag с одним из перечисленных в If-None-Match
+
+    Для If-None-Match используется слабое сравнение: префикс W/ не учитывается.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
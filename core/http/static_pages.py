@@ -0,0 +1,75 @@
+import gzip
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from core.http.conditional import REVALIDATE_CACHE_CONTROL, etag_matches, make_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _accepted_encodings(accept_encoding: str | None) -> set[str]:
+    """Кодировки из Accept-Encoding с ненулевым q"""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.lower())
+    return accepted
+
+
+class StaticPage:
+    """
+    Статический файл в памяти с заранее сжатыми вариантами gzip и brotli
+
+    Файл читается и сжимается один раз; на запрос отдается готовый вариант
+    под Accept-Encoding, а совпавший If-None-Match дает 304 без тела.
+    """
+
+    def __init__(self, path: Path, media_type: str = "text/html; charset=utf-8"):
+        """
+        Args:
+            path: Путь к файлу
+            media_type: Content-Type ответа
+        """
+        self.path = path
+        self.media_type = media_type
+        self._variants: dict[str, tuple[bytes, str]] = {}
+
+    def load(self):
+        content = self.path.read_bytes()
+        variants = {"identity": content, "gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants["br"] = brotli.compress(content, quality=11)
+        # У каждого варианта свой ETag: байты ответа разные
+        self._variants = {
+            encoding: (body, make_etag(body))
+            for encoding, body in variants.items()
+            if encoding == "identity" or len(body) < len(content)
+        }
+
+    def response(self, request: Request) -> Response:
+        if not self._variants:
+            self.load()
+
+        accepted = _accepted_encodings(request.headers.get("accept-encoding"))
+        encoding = next((e for e in ("br", "gzip") if e in accepted and e in self._variants), "identity")
+        body, etag = self._variants[encoding]
+
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=self.media_type, headers=headers)
@@ -0,0 +1,221 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+
+from config import ENCODE_WORKERS, JPEG_QUALITY, WEBP_QUALITY, AVIF_QUALITY
+
+MEDIA_TYPES = {
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+    "avif": "image/avif",
+}
+
+DEFAULT_QUALITY = {
+    "jpeg": JPEG_QUALITY,
+    "webp": WEBP_QUALITY,
+    "avif": AVIF_QUALITY,
+}
+
+# Форматы, которые умеет собранный Pillow
+SUPPORTED_FORMATS = ["jpeg"] + [fmt for fmt in ("webp", "avif") if features.check(fmt)]
+
+
+def encode_image(data: bytes, fmt: str, quality: int | None = None) -> bytes:
+    """
+    Перекодировать изображение (PNG/JPEG/...) в fmt
+
+    Выполняется в пуле процессов, поэтому — функция модуля без состояния.
+    """
+    img = Image.open(BytesIO(data))
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return _save(img, fmt, quality)
+
+
+def resize_image(data: bytes, width: int, fmt: str, quality: int | None = None) -> bytes:
+    """
+    Уменьшить изображение до ширины width с сохранением пропорций и закодировать в fmt
+
+    Выполняется в пуле процессов, поэтому — функция модуля без состояния.
+    """
+    img = Image.open(BytesIO(data))
+    width = min(width, img.width)
+    size = (width, max(1, round(img.height * width / img.width)))
+    # JPEG декодируется сразу в уменьшенном масштабе
+    img.draft("RGB", size)
+    img = img.convert("RGB")
+    if img.size != size:
+        img = img.resize(size, Image.Resampling.LANCZOS)
+    return _save(img, fmt, quality)
+
+
+def probe_image(data: bytes) -> tuple[str, tuple[int, int]]:
+    """
+    Формат и размер по заголовку, без декодирования пикселей — достаточно быстро для event loop
+
+    Raises:
+        OSError: Данные не похожи на изображение, которое умеет Pillow
+    """
+    with Image.open(BytesIO(data)) as img:
+        return img.format, img.size
+
+
+def decode_layer(data: bytes) -> Image.Image:
+    """Декодировать слой для многократного наложения: RGB, пиксели уже в памяти"""
+    return Image.open(BytesIO(data)).convert("RGB")
+
+
+def composite_image(
+        base: Image.Image,
+        patches: list[tuple[int, int, bytes]],
+        fmt: str,
+        quality: int | None = None,
+) -> bytes:
+    """
+    Наложить на копию базового слоя фрагменты (PNG) в пиксельных координатах (x, y) и закодировать в fmt
+
+    Выполняется в потоке, а не в пуле процессов: базовый слой — уже
+    декодированное изображение из кэша, передавать его в процесс дороже наложения.
+    """
+    img = base.copy()
+    for x, y, data in patches:
+        patch = Image.open(BytesIO(data))
+        img.paste(patch if patch.mode == img.mode else patch.convert(img.mode), (x, y))
+    return _save(img, fmt, quality)
+
+
+def _save(img: Image.Image, fmt: str, quality: int | None) -> bytes:
+    if quality is None:
+        quality = DEFAULT_QUALITY.get(fmt)
+
+    buf = BytesIO()
+    if fmt == "png":
+        # Промежуточный PNG перекодируется дальше — быстрое сжатие важнее размера
+        img.save(buf, "PNG", compress_level=1)
+    elif fmt == "jpeg":
+        img.save(buf, "JPEG", quality=quality)
+    elif fmt == "webp":
+        img.save(buf, "WEBP", quality=quality, method=4)
+    elif fmt == "avif":
+        img.save(buf, "AVIF", quality=quality)
+    else:
+        raise ValueError(f"Неподдерживаемый формат: {fmt}")
+    return buf.getvalue()
+
+
+# Формат миниатюр: WebP с прозрачностью, без поддержки WebP — PNG
+THUMBNAIL_FORMAT = "webp" if "webp" in SUPPORTED_FORMATS else "png"
+
+
+def make_thumbnail(data: bytes, size: int) -> bytes:
+    """
+    Квадратная миниатюра size x size с обрезкой по центру, как object-fit: cover
+
+    Выполняется в пуле процессов, поэтому — функция модуля без состояния.
+    """
+    img = Image.open(BytesIO(data))
+    # JPEG декодируется сразу в уменьшенном масштабе
+    img.draft("RGB", (size, size))
+    img = ImageOps.exif_transpose(img)
+    has_alpha = "A" in img.getbands() or "transparency" in img.info
+    img = img.convert("RGBA" if has_alpha else "RGB")
+    img = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+
+    buf = BytesIO()
+    if THUMBNAIL_FORMAT == "webp":
+        img.save(buf, "WEBP", quality=90, method=6)
+    else:
+        img.save(buf, "PNG", optimize=True)
+    return buf.getvalue()
+
+
+def sniff_format(data: bytes) -> str | None:
+    """Определить формат закодированного изображения по сигнатуре"""
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "avif"
+    return None
+
+
+def negotiate_format(accept: str | None, available: str | None = None) -> str | None:
+    """
+    Выбрать формат ответа по заголовку Accept
+
+    Args:
+        accept: Значение заголовка Accept
+        available: Уже готовый формат — отдается, если клиент его принимает
+
+    Returns:
+        Формат из SUPPORTED_FORMATS или None, если клиент не принимает ни один
+    """
+    if not accept:
+        return available or SUPPORTED_FORMATS[0]
+
+    weights: dict[str, float] = {}
+    for item in accept.split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[media_type.lower()] = q
+
+    def weight(fmt: str) -> float:
+        media_type = MEDIA_TYPES[fmt]
+        for candidate in (media_type, "image/*", "*/*"):
+            if candidate in weights:
+                return weights[candidate]
+        return 0.0
+
+    # Готовый формат не требует перекодирования — он выигрывает при равном весе
+    ranked = sorted(SUPPORTED_FORMATS, key=lambda fmt: (weight(fmt), fmt == available), reverse=True)
+    best = ranked[0]
+    return best if weight(best) > 0 else None
+
+
+class ImageEncoder:
+    """Кодирование изображений вне event loop — в пуле процессов"""
+
+    def __init__(self, workers: int = ENCODE_WORKERS):
+        self.workers = workers
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            # Daemon-процессы (воркеры RenderWorkerFarm) не могут порождать дочерние —
+            # там кодируем в потоках, Pillow отпускает GIL на время кодирования
+            if multiprocessing.current_process().daemon:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="encoder")
+            else:
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def encode(self, data: bytes, fmt: str, quality: int | None = None) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), encode_image, data, fmt, quality)
+
+    async def resize(self, data: bytes, width: int, fmt: str, quality: int | None = None) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), resize_image, data, width, fmt, quality)
+
+    async def thumbnail(self, data: bytes, size: int) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), make_thumbnail, data, size)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_encoder = ImageEncoder()
@@ -0,0 +1,58 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class LatencyStats:
+    """Скользящее окно замеров длительности с перцентилями"""
+
+    def __init__(self, window: int = 1024):
+        """
+        Args:
+            window: Сколько последних замеров хранить для расчета перцентилей
+        """
+        self._samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Замерить длительность блока `with`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Перцентиль по текущему окну
+
+        Args:
+            q: Квантиль от 0 до 100
+
+        Returns:
+            Значение в секундах или None, если замеров еще нет
+        """
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        """Сводка в миллисекундах: количество, p50, p95, p99, максимум"""
+
+        def _ms(value: float | None) -> float | None:
+            return round(value * 1000, 2) if value is not None else None
+
+        return {
+            "count": self.count,
+            "p50_ms": _ms(self.percentile(50)),
+            "p95_ms": _ms(self.percentile(95)),
+            "p99_ms": _ms(self.percentile(99)),
+            "max_ms": _ms(max(self._samples) if self._samples else None),
+        }
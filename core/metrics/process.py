@@ -0,0 +1,57 @@
+"""Память процессов по /proc (Linux); на других платформах значения нулевые"""
+from pathlib import Path
+
+
+def children(pid: int) -> list[int]:
+    """Прямые потомки процесса"""
+    pids = []
+    try:
+        for task in Path(f"/proc/{pid}/task").iterdir():
+            pids.extend(int(child) for child in (task / "children").read_text().split())
+    except (OSError, ValueError):
+        pass
+    return pids
+
+
+def descendants(pid: int) -> list[int]:
+    """Все потомки процесса"""
+    result = []
+    stack = children(pid)
+    while stack:
+        child = stack.pop()
+        result.append(child)
+        stack.extend(children(child))
+    return result
+
+
+def rss_bytes(pid: int) -> int:
+    """RSS одного процесса"""
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return 0
+
+
+def process_name(pid: int) -> str:
+    try:
+        return Path(f"/proc/{pid}/comm").read_text().strip()
+    except OSError:
+        return ""
+
+
+def tree_rss_bytes(pid: int, name_prefixes: tuple[str, ...] | None = None) -> int:
+    """
+    RSS процесса и всех его потомков
+
+    Args:
+        pid: Корень дерева процессов
+        name_prefixes: Учитывать только потомков, чье имя начинается с одного из префиксов
+    """
+    total = rss_bytes(pid) if name_prefixes is None else 0
+    for child in descendants(pid):
+        if name_prefixes is None or process_name(child).startswith(name_prefixes):
+            total += rss_bytes(child)
+    return total
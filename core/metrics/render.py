@@ -0,0 +1,26 @@
+"""Метрики рендера, общие для сервиса скриншотов, пула страниц и роутера"""
+from core.metrics.prometheus import registry
+
+SCREENSHOT_STAGE_SECONDS = registry.histogram(
+    "screenshot_stage_seconds",
+    "Длительность этапов получения скриншота",
+    ("stage",),
+)
+RENDER_SECONDS = registry.histogram(
+    "screenshot_render_seconds",
+    "Полное время рендера без попаданий в кэш",
+    ("format",),
+)
+RENDERS_IN_FLIGHT = registry.gauge(
+    "screenshot_renders_in_flight",
+    "Рендеры, выполняемые сейчас в этом процессе",
+)
+BROWSER_RSS_BYTES = registry.gauge(
+    "browser_rss_bytes",
+    "RSS процессов Chromium этого процесса",
+)
+BROWSER_RECYCLES = registry.counter(
+    "browser_recycles_total",
+    "Замены контекста или браузера Chromium",
+    ("kind", "reason"),
+)
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+
+from core.metrics.prometheus import registry
+
+STARTUP_PHASE_SECONDS = registry.gauge(
+    "startup_phase_seconds",
+    "Длительность этапов запуска процесса",
+    ("phase",),
+)
+READY = registry.gauge(
+    "startup_ready",
+    "1, когда процесс прогрет и готов принимать трафик",
+)
+
+
+class StartupProfile:
+    """Этапы запуска процесса: сколько занял каждый и готов ли процесс к трафику"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.ready = False
+        self.total: float | None = None
+        self.error: str | None = None
+        READY.set_function(lambda: int(self.ready))
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замерить этап запуска; ошибка этапа сохраняется для /ready"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.error = f"{name}: {type(e).__name__}: {e}"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.phases[name] = elapsed
+            STARTUP_PHASE_SECONDS.set(elapsed, phase=name)
+
+    def mark_ready(self):
+        self.total = time.perf_counter() - self.started
+        STARTUP_PHASE_SECONDS.set(self.total, phase="total")
+        self.ready = True
+        print(f"Процесс готов за {self.total * 1000:.0f} мс: " + ", ".join(
+            f"{name} {seconds * 1000:.0f} мс" for name, seconds in self.phases.items()
+        ))
+
+    def snapshot(self) -> dict:
+        """Сводка в миллисекундах по этапам и общее время до готовности"""
+        return {
+            "ready": self.ready,
+            "total_ms": round(self.total * 1000, 2) if self.total is not None else None,
+            "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()},
+            "error": self.error,
+        }
+
+
+startup = StartupProfile()
@@ -0,0 +1,75 @@
+import time
+
+
+class AIMDLimit:
+    """
+    Адаптивный лимит одновременных задач: AIMD по наблюдаемой латентности
+
+    Пока задачи укладываются в target_latency, лимит растет на единицу за
+    "окно" из limit завершений (аддитивно). Медленная или упавшая задача
+    уменьшает лимит в backoff раз (мультипликативно). Задачи, начатые до
+    последнего уменьшения, его не повторяют: одна перегрузка — одно снижение.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        target_latency: float,
+        backoff: float = 0.75,
+    ):
+        """
+        Args:
+            initial: Начальный лимит
+            min_limit: Нижняя граница лимита
+            max_limit: Верхняя граница лимита (например, размер пула страниц)
+            target_latency: Латентность в секундах, выше которой лимит снижается
+            backoff: Множитель снижения лимита, от 0 до 1
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._decreased_at = 0.0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def observe(self, started: float, latency: float, failed: bool = False):
+        """
+        Учесть завершенную задачу
+
+        Args:
+            started: Момент начала задачи по time.monotonic()
+            latency: Длительность задачи в секундах
+            failed: Задача завершилась ошибкой перегрузки (например, упал воркер)
+        """
+        if failed or latency > self.target_latency:
+            if started < self._decreased_at:
+                return
+            new_limit = max(float(self.min_limit), self._limit * self.backoff)
+            if int(new_limit) < self.limit:
+                self.decreases += 1
+            self._limit = new_limit
+            self._decreased_at = time.monotonic()
+            return
+
+        new_limit = min(float(self.max_limit), self._limit + 1 / self._limit)
+        if int(new_limit) > self.limit:
+            self.increases += 1
+        self._limit = new_limit
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "min": self.min_limit,
+            "max": self.max_limit,
+            "target_latency_ms": round(self.target_latency * 1000, 2),
+            "increases": self.increases,
+            "decreases": self.decreases,
+        }
@@ -0,0 +1,242 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from redis.exceptions import ResponseError
+
+from core.caching.in_redis import AsyncRedisCache
+
+QUEUED = "queued"
+RENDERING = "rendering"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Очередь заполнена до max_length — клиенту нужно повторить позже"""
+
+
+@dataclass
+class StreamJob:
+    message_id: str
+    job_id: str
+    payload: dict
+    deliveries: int = 1
+
+
+class AsyncRedisStreamQueue:
+    """Надежная очередь задач на Redis Streams с consumer group и статусами задач"""
+
+    def __init__(
+        self,
+        cache: AsyncRedisCache,
+        stream: str,
+        group: str,
+        max_length: int,
+        state_ttl: int = 3600,
+    ):
+        """
+        Args:
+            cache: Кэш, чье соединение с Redis используется очередью
+            stream: Имя стрима
+            group: Имя consumer group
+            max_length: Максимум задач в стриме (ожидающих и выполняемых)
+            state_ttl: Время жизни статуса задачи в секундах
+        """
+        self.client = cache.client
+        self.stream = stream
+        self.group = group
+        self.max_length = max_length
+        self.state_ttl = state_ttl
+
+    async def ensure_group(self):
+        """Создать стрим и consumer group, если их еще нет"""
+        try:
+            await self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def length(self) -> int:
+        """Количество задач в стриме (подтвержденные задачи удаляются)"""
+        return await self.client.xlen(self.stream)
+
+    async def enqueue(self, job_id: str, payload: dict, unique: bool = False) -> Optional[str]:
+        """
+        Поставить задачу в очередь
+
+        Args:
+            job_id: Идентификатор задачи
+            payload: Данные задачи
+            unique: Не добавлять задачу, если такая уже ждет или выполняется
+
+        Returns:
+            ID сообщения в стриме или None, если задача уже в очереди
+
+        Raises:
+            QueueFullError: В стриме уже max_length задач
+        """
+        if await self.length() >= self.max_length:
+            raise QueueFullError(f"Очередь {self.stream} заполнена ({self.max_length})")
+        if unique and await self._is_active(job_id):
+            return None
+
+        await self.set_state(job_id, QUEUED)
+        return await self.client.xadd(
+            self.stream, {"job_id": job_id, "payload": json.dumps(payload)}
+        )
+
+    async def enqueue_many(self, jobs: list[tuple[str, dict]], unique: bool = False) -> list[str]:
+        """
+        Поставить пачку задач одним pipeline
+
+        Args:
+            jobs: Пары (job_id, payload)
+            unique: Пропускать повторы и задачи, которые уже ждут или выполняются
+
+        Raises:
+            QueueFullError: Пачка не помещается в max_length
+        """
+        if unique:
+            jobs = list(dict(jobs).items())
+            states = await self.get_states([job_id for job_id, _ in jobs])
+            jobs = [(job_id, payload) for job_id, payload in jobs if states[job_id] not in (QUEUED, RENDERING)]
+        if not jobs:
+            return []
+        if await self.length() + len(jobs) > self.max_length:
+            raise QueueFullError(
+                f"Очередь {self.stream} не вмещает {len(jobs)} задач (максимум {self.max_length})"
+            )
+
+        now = str(time.time())
+        async with self.client.pipeline(transaction=False) as pipe:
+            for job_id, payload in jobs:
+                key = self._state_key(job_id)
+                pipe.hset(key, mapping={"state": QUEUED, "updated_at": now})
+                pipe.expire(key, self.state_ttl)
+                pipe.xadd(self.stream, {"job_id": job_id, "payload": json.dumps(payload)})
+            results = await pipe.execute()
+        return results[2::3]
+
+    async def read(self, consumer: str, count: int, block_ms: Optional[int] = 1000) -> list[StreamJob]:
+        """Получить новые задачи для потребителя (блокируется до block_ms; None — не ждать)"""
+        response = await self.client.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=count, block=block_ms
+        )
+        jobs = []
+        for _, messages in response or []:
+            jobs.extend(self._to_job(message_id, fields) for message_id, fields in messages)
+        return jobs
+
+    async def claim_stale(self, consumer: str, min_idle_ms: int, count: int) -> list[StreamJob]:
+        """
+        Забрать задачи, которые слишком долго висят у другого (упавшего) потребителя
+
+        Returns:
+            Задачи с заполненным числом доставок
+        """
+        _, messages, _ = await self.client.xautoclaim(
+            self.stream, self.group, consumer, min_idle_ms, start_id="0-0", count=count
+        )
+        jobs = []
+        for message_id, fields in messages:
+            if not fields:
+                continue
+            job = self._to_job(message_id, fields)
+            pending = await self.client.xpending_range(
+                self.stream, self.group, min=job.message_id, max=job.message_id, count=1
+            )
+            if pending:
+                job.deliveries = pending[0]["times_delivered"]
+            jobs.append(job)
+        return jobs
+
+    async def ack(self, job: StreamJob):
+        """Подтвердить и удалить задачу из стрима"""
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, job.message_id)
+            pipe.xdel(self.stream, job.message_id)
+            await pipe.execute()
+
+    async def set_state(self, job_id: str, state: str, **fields: Any):
+        key = self._state_key(job_id)
+        mapping = {"state": state, "updated_at": time.time(), **fields}
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping={k: str(v) for k, v in mapping.items()})
+            pipe.expire(key, self.state_ttl)
+            await pipe.execute()
+
+    async def get_state(self, job_id: str) -> Optional[dict]:
+        data = await self.client.hgetall(self._state_key(job_id))
+        if not data:
+            return None
+        return {k.decode(): v.decode() for k, v in data.items()}
+
+    async def get_states(self, job_ids: list[str]) -> dict[str, Optional[str]]:
+        """Состояния нескольких задач одним pipeline"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.hget(self._state_key(job_id), "state")
+            states = await pipe.execute()
+        return {
+            job_id: state.decode() if state is not None else None
+            for job_id, state in zip(job_ids, states)
+        }
+
+    async def _is_active(self, job_id: str) -> bool:
+        """
+        Задача уже ждет или выполняется
+
+        HSETNX занимает статус атомарно, поэтому из одновременных
+        одинаковых задач в стрим попадает только одна.
+        """
+        key = self._state_key(job_id)
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hsetnx(key, "state", QUEUED)
+            pipe.expire(key, self.state_ttl, nx=True)
+            pipe.hget(key, "state")
+            created, _, state = await pipe.execute()
+        if created:
+            return False
+        return state is not None and state.decode() in (QUEUED, RENDERING)
+
+    @staticmethod
+    def _state_key(job_id: str) -> str:
+        return f"job:{job_id}"
+
+    @staticmethod
+    def _to_job(message_id: bytes, fields: dict) -> StreamJob:
+        return StreamJob(
+            message_id=message_id.decode() if isinstance(message_id, bytes) else message_id,
+            job_id=fields[b"job_id"].decode(),
+            payload=json.loads(fields[b"payload"]),
+        )
+
+
+async def read_any(
+    queues: list[AsyncRedisStreamQueue],
+    consumer: str,
+    block_ms: int = 1000,
+) -> list[tuple[AsyncRedisStreamQueue, StreamJob]]:
+    """
+    Дождаться новой задачи в любой из очередей одним XREADGROUP
+
+    Очереди должны использовать одно соединение и одну consumer group;
+    из каждой очереди берется не больше одной задачи, поэтому задач может
+    прийти больше, чем нужно вызывающему. Они уже доставлены этому
+    потребителю: лишние нужно выполнить позже, а не отбрасывать.
+
+    Returns:
+        Пары (очередь, задача), приоритетные очереди первыми
+    """
+    by_stream = {queue.stream: queue for queue in queues}
+    response = await queues[0].client.xreadgroup(
+        queues[0].group, consumer, {stream: ">" for stream in by_stream}, count=1, block=block_ms
+    )
+    jobs = []
+    for stream, messages in response or []:
+        queue = by_stream[stream.decode() if isinstance(stream, bytes) else stream]
+        jobs.extend((queue, AsyncRedisStreamQueue._to_job(message_id, fields)) for message_id, fields in messages)
+    jobs.sort(key=lambda item: queues.index(item[0]))
+    return jobs
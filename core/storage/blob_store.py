@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from core.metrics.prometheus import registry
+
+BLOB_STORE_BYTES = registry.gauge(
+    "blob_store_bytes",
+    "Объем хранилища изображений на момент последней очистки",
+)
+BLOB_STORE_FILES = registry.gauge(
+    "blob_store_files",
+    "Число файлов в хранилище изображений на момент последней очистки",
+)
+BLOB_STORE_EVICTIONS = registry.counter(
+    "blob_store_evictions_total",
+    "Удаленные из хранилища файлы по причине (age, size)",
+    ("reason",),
+)
+
+_TMP_PREFIX = ".tmp-"
+# Недописанный временный файл старше этого считается брошенным упавшим процессом
+_TMP_MAX_AGE = 3600
+# При переполнении удаляем старые файлы до этой доли от max_bytes, чтобы не чистить на каждом проходе
+_EVICT_LOW_WATERMARK = 0.9
+
+
+class BlobStore:
+    """
+    Файловое хранилище по содержимому: root/ab/cd/<sha256>
+
+    Файл пишется во временный и переименовывается (os.replace), поэтому
+    читатели видят либо целый blob, либо никакого; одинаковые байты хранятся
+    один раз. Каталог может быть общим для процессов API и воркеров. Размер
+    хранилища ограничивают фоновая очистка по возрасту и по общему объему —
+    старые первыми. Возраст считается по atime: повторная запись тех же
+    байтов обновляет его, а mtime (Last-Modified) остается временем создания
+    содержимого.
+    """
+
+    def __init__(self, root: str | Path, max_bytes: int = 0, max_age: float = 0, evict_interval: float = 60):
+        """
+        Args:
+            root: Каталог хранилища
+            max_bytes: Предел общего объема в байтах (0 — без предела)
+            max_age: Предел возраста файла в секундах (0 — без предела)
+            evict_interval: Период фоновой очистки в секундах
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.evict_interval = evict_interval
+        self._evictor: asyncio.Task | None = None
+
+    @staticmethod
+    def digest(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def put(self, data: bytes) -> str:
+        """Записать blob атомарно и вернуть его хэш; блокирующий вызов"""
+        digest = self.digest(data)
+        path = self.path(digest)
+        try:
+            # Такой blob уже есть — только продлеваем ему жизнь, не меняя mtime
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+            return digest
+        except FileNotFoundError:
+            pass
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=_TMP_PREFIX, dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # mkstemp создает файл 0600 — blob должны читать процессы других пользователей
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        return digest
+
+    def stat(self, digest: str) -> os.stat_result | None:
+        try:
+            return os.stat(self.path(digest))
+        except FileNotFoundError:
+            return None
+
+    def read(self, digest: str) -> bytes | None:
+        """Прочитать blob через mmap: одно копирование из page cache без цикла read(); блокирующий вызов"""
+        try:
+            with open(self.path(digest), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b""
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return mapped[:]
+        except FileNotFoundError:
+            return None
+
+    def evict(self) -> int:
+        """
+        Удалить файлы старше max_age, затем самые старые, пока объем больше max_bytes
+
+        Returns:
+            Сколько файлов удалено
+        """
+        now = time.time()
+        removed = 0
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.root.glob("??/??/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            age = now - max(stat.st_atime, stat.st_mtime)
+            if path.name.startswith(_TMP_PREFIX):
+                if age > _TMP_MAX_AGE:
+                    self._unlink(path)
+                continue
+            if self.max_age and age > self.max_age:
+                if self._unlink(path):
+                    removed += 1
+                    BLOB_STORE_EVICTIONS.inc(reason="age")
+                continue
+            entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        files = len(entries)
+        if self.max_bytes and total > self.max_bytes:
+            target = self.max_bytes * _EVICT_LOW_WATERMARK
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                if self._unlink(path):
+                    removed += 1
+                    BLOB_STORE_EVICTIONS.inc(reason="size")
+                total -= size
+                files -= 1
+
+        BLOB_STORE_BYTES.set(total)
+        BLOB_STORE_FILES.set(files)
+        return removed
+
+    @staticmethod
+    def _unlink(path: Path) -> bool:
+        # Тот же файл мог удалить другой процесс с общим каталогом
+        try:
+            path.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def start(self):
+        """Создать каталог и запустить фоновую очистку"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self._evictor is None and (self.max_bytes or self.max_age):
+            self._evictor = asyncio.create_task(self._evict_loop())
+
+    async def stop(self):
+        if self._evictor is not None:
+            self._evictor.cancel()
+            try:
+                await self._evictor
+            except asyncio.CancelledError:
+                pass
+            self._evictor = None
+
+    async def _evict_loop(self):
+        while True:
+            try:
+                removed = await asyncio.to_thread(self.evict)
+                if removed:
+                    print(f"Хранилище изображений: удалено файлов {removed}")
+            except Exception as e:
+                print(f"Ошибка очистки хранилища изображений: {e}")
+            await asyncio.sleep(self.evict_interval)
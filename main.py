@@ -5,14 +5,49 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 import api
-from api.v1.services.screenshot_generator import screenshot_service
+from api.v1.routers.screenshots import STATIC_PAGES
+from api.v1.services.crypto_rates import price_provider
+from api.v1.services.phantom import warmup_contexts
+from api.v1.services.render_farm import renderer
+from api.v1.services.render_jobs import render_consumer
+from api.v1.services.result_notifier import result_notifier
+from api.v1.services.results import result_store
+from api.v1.services.screenshot_generator import precompile_templates
+from config import EMBEDDED_WORKER, STARTUP_WARMUP
+from core.caching.in_redis import cache
+from core.metrics.startup import startup
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await screenshot_service.start()
+    with startup.phase("cache"):
+        await cache.start()
+        await result_notifier.start()
+        await result_store.start()
+    with startup.phase("prices"):
+        await price_provider.start()
+        # Курс SOL нужен каждому POST /phantom — загружаем заранее
+        await price_provider.warm(["SOL"])
+    with startup.phase("templates"):
+        precompile_templates()
+        for page in STATIC_PAGES:
+            page.load()
+    if EMBEDDED_WORKER:
+        with startup.phase("browser"):
+            await renderer.start()
+        if STARTUP_WARMUP:
+            with startup.phase("warmup"):
+                await renderer.warmup(warmup_contexts())
+        await render_consumer.start()
+    startup.mark_ready()
     yield
-    await screenshot_service.stop()
+    # Балансировщик перестает слать запросы, пока процесс останавливается
+    startup.ready = False
+    if EMBEDDED_WORKER:
+        await render_consumer.stop()
+        await renderer.stop()
+    await result_store.stop()
+    await price_provider.close()
 
 
 def register_app() -> FastAPI:
@@ -0,0 +1,50 @@
+"""
+Отдельный процесс-потребитель очереди рендера
+
+    python worker.py
+
+Запускает рендерер (Chromium или пул процессов при RENDER_WORKERS > 0)
+и обрабатывает задачи из Redis Streams до SIGINT/SIGTERM.
+"""
+import asyncio
+import signal
+
+from api.v1.services.phantom import warmup_contexts
+from api.v1.services.render_farm import renderer
+from api.v1.services.render_jobs import render_consumer
+from api.v1.services.results import result_store
+from api.v1.services.screenshot_generator import precompile_templates
+from config import STARTUP_WARMUP
+from core.caching.in_redis import cache
+from core.metrics.startup import startup
+
+
+async def main():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    with startup.phase("cache"):
+        await cache.start()
+        await result_store.start()
+    with startup.phase("templates"):
+        precompile_templates()
+    with startup.phase("browser"):
+        await renderer.start()
+    if STARTUP_WARMUP:
+        with startup.phase("warmup"):
+            await renderer.warmup(warmup_contexts())
+    await render_consumer.start()
+    startup.mark_ready()
+    try:
+        await stop.wait()
+    finally:
+        await render_consumer.stop()
+        await renderer.stop()
+        await result_store.stop()
+        await cache.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())